@@ -3,7 +3,9 @@ Flask application for Pod GPT with Authentication
 """
 
 # Standard library imports
+import functools
 import os
+import re
 import shutil
 import uuid
 import logging
@@ -18,11 +20,13 @@ from datetime import datetime
 
 # Third-party imports
 from flask import Flask, render_template, request, send_from_directory, after_this_request
-from flask_login import LoginManager, login_required
+from flask_login import LoginManager, current_user, login_required
 from loguru import logger
 
 # Import the existing podcast generation function and constants
 from podcast_generator import generate_podcast as generate_podcast_core
+from job_checkpoint import ResumableJobError
+from jobs import JobCancelled, JobContext, JobLaneBusy, cancel_submitted_job, lane_scope
 from constants import (
     APP_TITLE,
     CHARACTER_LIMIT,
@@ -30,6 +34,7 @@ from constants import (
     ERROR_MESSAGE_NO_INPUT,
     ERROR_MESSAGE_READING_PDF,
     ERROR_MESSAGE_TOO_LONG,
+    CANCEL_SUPERSEDED_JOBS,
     UI_EXAMPLES,
     TEMP_AUDIO_DIR,
     GRADIO_CACHE_DIR,
@@ -174,8 +179,44 @@ def allowed_script_file(filename):
     """Check if the uploaded file is a valid script file"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'md', 'txt'}
 
+def cancellable_job(lane):
+    """Run a request as a job in a scheduler lane that the page can cancel by the job_id it submitted"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            owner = str(current_user.get_id())
+            # The page's ID only finds the job for cancelling; the job ID itself
+            # (which also names its checkpoint) is always generated here
+            client_id = request.form.get('job_id', '')
+            job = JobContext(
+                owner=owner,
+                client_id=client_id if re.fullmatch(r'[0-9a-f]{32}', client_id) else None
+            )
+            
+            # A resubmission names the job the same form (in the same tab) submitted
+            # before; only that one is replaced, other jobs of the user keep running
+            superseded_id = request.form.get('supersedes_job_id', '')
+            if CANCEL_SUPERSEDED_JOBS and re.fullmatch(r'[0-9a-f]{32}', superseded_id):
+                if cancel_submitted_job(owner, superseded_id):
+                    app.logger.info(f'Job {superseded_id} superseded by job {job.job_id}')
+            
+            # Waits for a free slot in the lane; raises JobLaneBusy if none frees up in time
+            with lane_scope(job, lane):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job_request(job_id):
+    """Cancel a running job of the current user; pages send this when they are left"""
+    if cancel_submitted_job(str(current_user.get_id()), job_id):
+        app.logger.info(f'Job {job_id} cancelled by the client')
+    return '', 204
+
 @app.route('/generate', methods=['POST'])
 @login_required
+@cancellable_job("synthesis")
 def generate_podcast():
     """Handle podcast generation request"""
     start_time = datetime.now()
@@ -263,6 +304,8 @@ def generate_podcast():
         voice_provider = request.form.get('voice_provider', 'google_tts')
         host_voice = request.form.get('host_voice', 'random')
         guest_voice = request.form.get('guest_voice', 'random')
+        # Opt-in quality mode: second LLM pass to refine the script
+        refine_script = True if request.form.get('refine_script') else None
 
         # Log form data
         app.logger.info(f'Generation parameters: files={len(uploaded_files)}, url={bool(url)}, '
@@ -320,7 +363,8 @@ def generate_podcast():
                 guest_name=guest_name,
                 voice_provider=voice_provider,
                 host_voice=host_voice,
-                guest_voice=guest_voice
+                guest_voice=guest_voice,
+                refine_script=refine_script
             )
             app.logger.info('Podcast generation from content completed successfully')
         
@@ -467,11 +511,13 @@ def generate_podcast():
         
         return render_template('index.html',
                              error=error_msg,
+                             retry_job_id=e.job_id if isinstance(e, ResumableJobError) else None,
                              title=APP_TITLE,
                              examples=UI_EXAMPLES)
 
 @app.route('/generate-script', methods=['POST'])
 @login_required
+@cancellable_job("script")
 def generate_script_only():
     """Generate script without audio synthesis for editing"""
     start_time = datetime.now()
@@ -545,6 +591,8 @@ def generate_script_only():
         voice_provider = request.form.get('voice_provider', 'google_tts')
         host_voice = request.form.get('host_voice', 'random')
         guest_voice = request.form.get('guest_voice', 'random')
+        # Opt-in quality mode: second LLM pass to refine the script
+        refine_script = True if request.form.get('refine_script') else None
         
         # If script content is provided, skip generation and go directly to editor
         if script_content:
@@ -587,7 +635,8 @@ def generate_script_only():
             length=length,
             language=language,
             host_name=host_name,
-            guest_name=guest_name
+            guest_name=guest_name,
+            refine_script=refine_script
         )
         
         # Clean up uploaded files
@@ -658,6 +707,7 @@ def script_editor():
 
 @app.route('/synthesize-audio', methods=['POST'])
 @login_required
+@cancellable_job("synthesis")
 def synthesize_audio():
     """Synthesize audio from edited script"""
     start_time = datetime.now()
@@ -667,36 +717,48 @@ def synthesize_audio():
         # Get the edited script and generation parameters
         edited_script = request.form.get('script', '').strip()
         generation_params_json = request.form.get('generation_params', '{}')
+        # Set when retrying a job that kept the audio of its completed lines
+        resume_job_id = request.form.get('resume_job_id', '').strip()
         
-        if not edited_script:
+        if not edited_script and not resume_job_id:
             return render_template('index.html',
                                  error="No script provided for synthesis.",
                                  title=APP_TITLE,
                                  examples=UI_EXAMPLES)
 
-        # Parse generation parameters
-        import json
-        generation_params = json.loads(generation_params_json)
-        
-        # Get form values for host and guest names (these take precedence over generation_params)
-        host_name = request.form.get('host_name', '').strip() or generation_params.get('host_name', 'Sam')
-        guest_name = request.form.get('guest_name', '').strip() or generation_params.get('guest_name', 'AI Assistant')
-        
-        app.logger.info(f'Audio synthesis with host: {host_name}, guest: {guest_name}')
-        
-        # Import the audio synthesis function
-        from podcast_generator import synthesize_audio_from_script
-        
-        # Synthesize audio from edited script
-        audio_file_path, transcript, vtt_file_path, h5p_file_path, host_channel_path, guest_channel_path = synthesize_audio_from_script(
-            edited_script,
-            generation_params['language'],
-            host_name,
-            guest_name,
-            generation_params.get('voice_provider', 'google_tts'),
-            generation_params.get('host_voice', 'random'),
-            generation_params.get('guest_voice', 'random')
-        )
+        if resume_job_id:
+            app.logger.info(f'Retrying the failed lines of job {resume_job_id}')
+            
+            from podcast_generator import resume_podcast
+            
+            # Synthesize the missing lines of the failed job's script
+            audio_file_path, transcript, vtt_file_path, h5p_file_path, host_channel_path, guest_channel_path = resume_podcast(
+                resume_job_id, owner=str(current_user.get_id())
+            )
+        else:
+            # Parse generation parameters
+            import json
+            generation_params = json.loads(generation_params_json)
+            
+            # Get form values for host and guest names (these take precedence over generation_params)
+            host_name = request.form.get('host_name', '').strip() or generation_params.get('host_name', 'Sam')
+            guest_name = request.form.get('guest_name', '').strip() or generation_params.get('guest_name', 'AI Assistant')
+            
+            app.logger.info(f'Audio synthesis with host: {host_name}, guest: {guest_name}')
+            
+            # Import the audio synthesis function
+            from podcast_generator import synthesize_audio_from_script
+            
+            # Synthesize audio from edited script
+            audio_file_path, transcript, vtt_file_path, h5p_file_path, host_channel_path, guest_channel_path = synthesize_audio_from_script(
+                edited_script,
+                generation_params['language'],
+                host_name,
+                guest_name,
+                generation_params.get('voice_provider', 'google_tts'),
+                generation_params.get('host_voice', 'random'),
+                generation_params.get('guest_voice', 'random')
+            )
 
         # Move generated audio to static folder
         vtt_filename = None
@@ -815,6 +877,7 @@ def synthesize_audio():
         
         return render_template('index.html',
                              error=error_msg,
+                             retry_job_id=e.job_id if isinstance(e, ResumableJobError) else None,
                              title=APP_TITLE,
                              examples=UI_EXAMPLES)
 
@@ -936,6 +999,24 @@ def handle_client_disconnected(e):
                           title=APP_TITLE,
                           examples=UI_EXAMPLES), 400
 
+@app.errorhandler(JobLaneBusy)
+def handle_job_lane_busy(e):
+    """Handle jobs turned away because their scheduler lane stayed full"""
+    app.logger.warning(f"Job turned away, the {e.lane} lane is full: {request.url}")
+    return render_template('index.html',
+                          error=str(e),
+                          title=APP_TITLE,
+                          examples=UI_EXAMPLES), 503
+
+@app.errorhandler(JobCancelled)
+def handle_job_cancelled(e):
+    """Handle jobs cancelled while they waited for a slot"""
+    app.logger.info(f"Job cancelled before it started: {request.url}")
+    return render_template('index.html',
+                          error=str(e),
+                          title=APP_TITLE,
+                          examples=UI_EXAMPLES), 409
+
 if __name__ == '__main__':
     # Development server
     port = int(os.environ.get('FLASK_RUN_PORT', 7042))
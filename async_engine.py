@@ -0,0 +1,121 @@
+"""
+async_engine.py - Shared asyncio event loop for all provider I/O
+
+Every outbound provider call (Gemini, Google Cloud TTS, ElevenLabs, Jina) is a
+coroutine that runs on one event loop in a background thread, so a worker
+process can keep many requests in flight without one OS thread per request.
+Flask routes and other synchronous code use the engine as a facade:
+
+    result = engine.run(some_coroutine(), timeout=60)     # block for the result
+    future = engine.submit(some_coroutine())              # concurrent.futures.Future
+
+Coroutines run in a copy of the submitting thread's context, so context
+variables such as the current job (jobs.py) follow the work onto the loop.
+Cancelling a job cancels every coroutine submitted on its behalf.
+
+The loop is started lazily and restarted after a fork (e.g. in a new worker
+process), since an event loop and its connections cannot cross a fork.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from constants import HTTP_POOL_MAX_CONNECTIONS, HTTP_POOL_MAX_KEEPALIVE
+from jobs import current_job
+
+
+class AsyncEngine:
+    """An asyncio event loop in a daemon thread with per-loop shared clients."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._resources: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running engine loop, starting it on first use in this process."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                # Anything inherited from a parent process belongs to a dead loop
+                self._resources = {}
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="async-engine", daemon=True
+                )
+                self._thread.start()
+                logger.info(f"Started async I/O engine in process {self._pid}")
+            return self._loop
+
+    def in_engine_thread(self) -> bool:
+        """Return True when called from the engine's own loop thread."""
+        return self._thread is threading.current_thread()
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule a coroutine on the engine loop and return a thread-safe future.
+
+        Cancelling the future (or the current job) cancels the coroutine,
+        including any request it is waiting on.
+        """
+        future = asyncio.run_coroutine_threadsafe(_run_in_context(coro, contextvars.copy_context()), self.loop())
+        job = current_job()
+        if job is not None:
+            unregister = job.cancellation.add_callback(future.cancel)
+            future.add_done_callback(lambda _: unregister())
+        return future
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block until it finishes.
+
+        Must not be called from the engine thread itself; coroutines there
+        should await each other directly.
+        """
+        if self.in_engine_thread():
+            raise RuntimeError("AsyncEngine.run called from the engine thread; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def resource(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return a client bound to the engine loop, creating it on first use.
+
+        Call this from coroutines running on the engine. Async SDK clients
+        attach to the loop they were created on, so they are created lazily
+        here and recreated together with the loop after a fork.
+        """
+        resource = self._resources.get(name)
+        if resource is None:
+            resource = factory()
+            self._resources[name] = resource
+        return resource
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Return the pooled HTTP client shared by all plain-HTTP providers."""
+        return self.resource("http", lambda: httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            ),
+            timeout=60,
+        ))
+
+
+async def _run_in_context(coro: Awaitable, context: contextvars.Context) -> Any:
+    """Run coro as a task in the given context; cancelling the caller cancels it."""
+    return await asyncio.get_running_loop().create_task(coro, context=context)
+
+
+# One engine per process, shared by every job
+engine = AsyncEngine()
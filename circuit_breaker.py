@@ -0,0 +1,153 @@
+"""
+circuit_breaker.py - Per-provider circuit breakers for TTS calls
+
+When a provider is down, every line would otherwise spend its full retry
+schedule before failing. A CircuitBreaker watches the outcome of recent
+requests to one provider:
+- closed: requests go through; it trips open once enough of the requests in
+  the last window failed with provider errors (timeouts, 5xx)
+- open: requests fail immediately with CircuitOpenError
+- half-open: after a cool-down a single probe request is let through; its
+  outcome closes the circuit again or re-opens it
+
+Breakers are shared by every job in the process and run on the async engine.
+"""
+
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from loguru import logger
+
+from constants import (
+    CIRCUIT_BREAKER_FAILURE_RATE,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    CIRCUIT_BREAKER_WINDOW,
+)
+from rate_limiter import is_throttle_error
+from retry_policy import is_retryable
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Return True for errors that indicate the provider itself is unhealthy.
+
+    Invalid requests are the caller's fault and throttling is handled by the
+    rate limiter, so neither counts against the provider.
+    """
+    return is_retryable(error) and not is_throttle_error(error)
+
+
+class CircuitBreaker:
+    """Stop calling a provider while it is failing, and probe it for recovery."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        failure_rate: float = CIRCUIT_BREAKER_FAILURE_RATE,
+        window_seconds: float = CIRCUIT_BREAKER_WINDOW,
+        reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        # (timestamp, failed) of recent requests while closed
+        self._outcomes = deque()
+
+    @property
+    def is_open(self) -> bool:
+        """Return True while requests are being short-circuited."""
+        return self.state == OPEN and time.monotonic() < self._opened_at + self.reset_timeout
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent now."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() < self._opened_at + self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+            logger.info(f"Circuit for {self.name} is half-open, sending a probe request")
+        # Half-open: exactly one probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            logger.info(f"Circuit for {self.name} closed, provider recovered")
+            self.state = CLOSED
+            self._probe_in_flight = False
+            self._outcomes.clear()
+            return
+        self._record(failed=False)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._record(failed=True)
+        failures = sum(1 for _, failed in self._outcomes if failed)
+        if failures >= self.failure_threshold and failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _record(self, failed: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self) -> None:
+        logger.warning(f"Circuit for {self.name} opened, short-circuiting requests for {self.reset_timeout:g}s")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    async def call(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        """Await operation() unless the circuit is open, and record its outcome."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = await operation()
+        except Exception as e:
+            if is_provider_failure(e):
+                self.record_failure()
+            elif self.state == HALF_OPEN:
+                # The probe reached the provider, which is all it had to show
+                self.record_success()
+            raise
+        except BaseException:
+            # Cancelled: the probe proved nothing, let the next request try
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for a provider. Call this from the engine loop."""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(provider)
+        _breakers[provider] = breaker
+    return breaker
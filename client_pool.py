@@ -0,0 +1,184 @@
+"""
+client_pool.py - Pools of long-lived SDK clients on the async engine
+
+A single gRPC client multiplexes every request over one HTTP/2 connection, which
+becomes a head-of-line bottleneck once many lines are synthesized at once. A
+ClientPool keeps a fixed number of clients (each with its own connection) per
+endpoint and API key:
+- clients are created on the engine loop on first use, i.e. after a worker
+  process forked, and shared by every job of the worker
+- all connections are opened in the background when the pool is first used,
+  so connection setup happens once per worker rather than per burst
+- each request goes to the client with the fewest requests in flight
+- a client whose channel reports a failure, or that failed several requests in
+  a row, is replaced; it is closed once its last request finishes
+
+    with pool.lease() as client:
+        response = await client.synthesize_speech(...)
+
+Pools are bound to the engine loop: get them through engine.resource().
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List, Optional
+
+from loguru import logger
+
+from circuit_breaker import is_provider_failure
+from constants import CLIENT_POOL_MAX_FAILURES, CLIENT_POOL_WARM_UP_TIMEOUT
+
+
+class _PooledClient:
+    """One client of a pool and its usage."""
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.in_flight = 0
+        self.requests = 0
+        self.consecutive_failures = 0
+        self.retired = False
+
+
+class ClientPool:
+    """A fixed number of clients for one endpoint, shared by every job in the worker."""
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        size: int,
+        is_healthy: Optional[Callable[[Any], bool]] = None,
+        wait_ready: Optional[Callable[[Any], Awaitable]] = None,
+        close: Optional[Callable[[Any], Awaitable]] = None,
+        max_failures: int = CLIENT_POOL_MAX_FAILURES
+    ):
+        """
+        Args:
+            name: Name for logs
+            factory: Creates a client; called on the engine loop
+            size: Number of clients
+            is_healthy: Returns False for a client that must be replaced (checked on every lease)
+            wait_ready: Coroutine that returns once a new client is connected (used to warm up)
+            close: Coroutine that releases a replaced client's connection
+            max_failures: Consecutive provider errors after which a client is replaced
+        """
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self.is_healthy = is_healthy
+        self.wait_ready = wait_ready
+        self.close = close
+        self.max_failures = max_failures
+        self._slots: List[Optional[_PooledClient]] = [None] * size
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.replaced = 0
+
+    def _create(self, index: int) -> _PooledClient:
+        slot = _PooledClient(self.factory())
+        self._slots[index] = slot
+        return slot
+
+    def _healthy(self, slot: _PooledClient) -> bool:
+        if self.is_healthy is None:
+            return True
+        try:
+            return self.is_healthy(slot.client)
+        except Exception:
+            return False
+
+    def _retire(self, index: int, reason: str) -> None:
+        """Replace the client at index; the old one is closed when it is idle."""
+        slot = self._slots[index]
+        logger.warning(f"Replacing {self.name} client #{index + 1}: {reason}")
+        slot.retired = True
+        self._slots[index] = None
+        self.replaced += 1
+        if slot.in_flight == 0:
+            self._close(slot)
+
+    def _close(self, slot: _PooledClient) -> None:
+        if self.close is not None:
+            asyncio.ensure_future(self._close_quietly(slot.client))
+
+    async def _close_quietly(self, client: Any) -> None:
+        try:
+            await self.close(client)
+        except Exception as e:
+            logger.debug(f"Closing a replaced {self.name} client failed: {e}")
+
+    def warm_up(self) -> None:
+        """Create every client and open their connections in the background."""
+        if self._warm_up_task is not None:
+            return
+        for index, slot in enumerate(self._slots):
+            if slot is None:
+                self._create(index)
+        if self.wait_ready is not None:
+            self._warm_up_task = asyncio.ensure_future(self._wait_all_ready())
+
+    async def _wait_all_ready(self) -> None:
+        clients = [slot.client for slot in self._slots if slot is not None]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(self.wait_ready(client) for client in clients)),
+                CLIENT_POOL_WARM_UP_TIMEOUT
+            )
+            logger.info(f"Opened {len(clients)} {self.name} connections")
+        # Either way, requests still connect on demand
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} connections not ready after {CLIENT_POOL_WARM_UP_TIMEOUT}s")
+        except Exception as e:
+            logger.warning(f"Warming up {self.name} connections failed: {e}")
+
+    def acquire(self) -> _PooledClient:
+        """Return the healthy client with the fewest requests in flight. Pair with release()."""
+        if self._warm_up_task is None:
+            self.warm_up()
+        for index, slot in enumerate(self._slots):
+            if slot is not None and not self._healthy(slot):
+                self._retire(index, "channel is not healthy")
+        for index, slot in enumerate(self._slots):
+            if slot is None:
+                self._create(index)
+        slot = min(self._slots, key=lambda s: s.in_flight)
+        slot.in_flight += 1
+        slot.requests += 1
+        return slot
+
+    def release(self, slot: _PooledClient, error: Optional[BaseException] = None) -> None:
+        """Return a client after a request; repeated provider errors replace it."""
+        slot.in_flight -= 1
+        if slot.retired:
+            if slot.in_flight == 0:
+                self._close(slot)
+            return
+        if error is not None and is_provider_failure(error):
+            slot.consecutive_failures += 1
+            if slot.consecutive_failures >= self.max_failures:
+                self._retire(self._slots.index(slot), f"{slot.consecutive_failures} failed requests in a row")
+        elif error is None:
+            slot.consecutive_failures = 0
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """Hold a client for the duration of one request."""
+        slot = self.acquire()
+        try:
+            yield slot.client
+        except Exception as e:
+            self.release(slot, e)
+            raise
+        except BaseException:
+            self.release(slot)
+            raise
+        else:
+            self.release(slot)
+
+    def stats(self) -> List[dict]:
+        """Return per-client usage."""
+        return [
+            {'client': index + 1, 'in_flight': slot.in_flight, 'requests': slot.requests}
+            for index, slot in enumerate(self._slots)
+            if slot is not None
+        ]
@@ -2,6 +2,7 @@
 constants.py
 """
 
+import math
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -9,6 +10,15 @@ from pathlib import Path
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _api_keys(pool_variable, *single_variables):
+    """Read a comma-separated key pool, falling back to a single-key variable."""
+    keys = [key.strip() for key in os.getenv(pool_variable, "").split(",") if key.strip()]
+    if not keys:
+        keys = [key for key in (os.getenv(name) for name in single_variables) if key][:1]
+    return keys
+
+
 # Key constants
 APP_TITLE = "Pod GPT 🎙️"
 CHARACTER_LIMIT = 250_000
@@ -28,20 +38,273 @@ ERROR_MESSAGE_READING_PDF = "Error reading the PDF file"
 ERROR_MESSAGE_TOO_LONG = "The total content is too long. Please ensure the combined text from PDFs and URL is fewer than {CHARACTER_LIMIT} characters."
 
 # Google Gemini API-related constants
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+# One or more API keys; GEMINI_API_KEYS takes a comma-separated pool
+GEMINI_API_KEYS = _api_keys("GEMINI_API_KEYS", "GEMINI_API_KEY", "GOOGLE_API_KEY")
+GEMINI_API_KEY = GEMINI_API_KEYS[0] if GEMINI_API_KEYS else None
 GEMINI_MAX_TOKENS = 65536
 GEMINI_MODEL_ID = "gemini-2.5-flash"
 GEMINI_TEMPERATURE = 0.1
 
+# LLM provider for script generation: "gemini" or "openai_compatible"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+
+# OpenAI-compatible endpoint (e.g. a self-hosted vLLM, llama.cpp or Ollama server)
+OPENAI_COMPAT_BASE_URL = os.getenv("OPENAI_COMPAT_BASE_URL")  # e.g. http://localhost:8000/v1
+OPENAI_COMPAT_API_KEY = os.getenv("OPENAI_COMPAT_API_KEY")
+OPENAI_COMPAT_MODEL = os.getenv("OPENAI_COMPAT_MODEL")  # Used for every route when set
+
+# Model routing for script generation. Routes are checked in order and the first
+# one that covers the requested length and input size (in characters) is used,
+# so small jobs get the fastest model and tight limits.
+LLM_ROUTES = [
+    {
+        "name": "lite",
+        "lengths": ("short",),
+        "max_input_chars": 50_000,
+        "model": "gemini-2.5-flash-lite",
+        "max_output_tokens": 4096,
+        "timeout": 30,
+    },
+    {
+        "name": "standard",
+        "lengths": ("short", "medium"),
+        "max_input_chars": 150_000,
+        "model": GEMINI_MODEL_ID,
+        "max_output_tokens": 16384,
+        "timeout": 45,
+    },
+    {
+        "name": "large",
+        "lengths": ("short", "medium", "long"),
+        "max_input_chars": None,  # Up to CHARACTER_LIMIT
+        "model": GEMINI_MODEL_ID,
+        "max_output_tokens": GEMINI_MAX_TOKENS,
+        "timeout": 60,
+    },
+]
+
+# Dialogue schema mode: "full" asks the model for a scratchpad with its planning,
+# "lean" omits it and bounds thinking, since output tokens dominate LLM latency
+DIALOGUE_SCHEMA_MODE = "lean"
+# Output token limits per length in lean mode (thinking tokens count towards them)
+GEMINI_LEAN_MAX_TOKENS = {
+    "short": 4096,
+    "medium": 8192,
+    "long": 16384,
+}
+GEMINI_LEAN_THINKING_BUDGET = 1024
+
+# Script generation-related constants
+# When enabled, generate_script makes a second "improve the dialogue" LLM call.
+# It is an opt-in quality mode: by default the first draft is only repaired
+# locally, so it is final and can be streamed straight to TTS.
+SCRIPT_REFINEMENT_ENABLED = False
+# Synthesize first-draft lines while the refinement call runs and reuse
+# the audio of every line the refinement leaves unchanged
+SPECULATIVE_SYNTHESIS_ENABLED = True
+# Source documents at least this long are registered once as a Gemini cached
+# context and referenced by the LLM calls that reuse it (long-form sections and
+# later scripts of the same document)
+CONTEXT_CACHE_MIN_CHARS = 8_000
+CONTEXT_CACHE_TTL_SECONDS = 60 * 60  # 1 hour
+# Long-form scripts are planned as an outline first and the sections are
+# then written by parallel LLM calls, instead of one large, slow call
+LONG_FORM_SECTIONED_ENABLED = True
+LONG_FORM_SECTION_COUNT = 5
+# Dialogue items shorter than this are merged into the previous line of the same speaker
+DIALOGUE_REPAIR_MIN_CHARS = 12
+
+# Async I/O engine-related constants
+# Connection pool of the shared async HTTP client (ElevenLabs, Jina, OpenAI-compatible)
+HTTP_POOL_MAX_CONNECTIONS = 200
+HTTP_POOL_MAX_KEEPALIVE = 50
+
+# Client-side rate limits per provider, applied per API key. Concurrency starts
+# at initial_concurrency and adapts (AIMD) between 1 and max_concurrency.
+# Tune the rates to the quotas of the project / subscription in use.
+RATE_LIMITS = {
+    "google_tts": {
+        "requests_per_second": 15,
+        "characters_per_second": 15_000,
+        "initial_concurrency": 4,
+        "max_concurrency": 32,
+    },
+    "elevenlabs": {
+        "requests_per_second": 5,
+        "characters_per_second": None,
+        "initial_concurrency": 2,
+        "max_concurrency": 10,
+    },
+    "local": {
+        "requests_per_second": None,
+        "characters_per_second": None,
+        "initial_concurrency": 8,
+        "max_concurrency": 64,
+    },
+    # LLM calls take tens of seconds, so their limit is mostly on concurrency;
+    # when it is reached, script-lane calls go before synthesis-lane calls
+    "gemini": {
+        "requests_per_second": None,
+        "characters_per_second": None,
+        "initial_concurrency": 8,
+        "max_concurrency": 32,
+    },
+    "openai_compatible": {
+        "requests_per_second": None,
+        "characters_per_second": None,
+        "initial_concurrency": 4,
+        "max_concurrency": 16,
+    },
+}
+# Pause before new requests after a throttle response without Retry-After
+RATE_LIMIT_THROTTLE_COOLDOWN = 2.0  # in seconds
+
+# API key pools: requests are spread over all keys of a provider
+# ("round_robin" or "least_loaded"); rate limits above apply per key
+KEY_POOL_STRATEGY = "least_loaded"
+# A key the provider throttled is left out of rotation this long
+KEY_POOL_THROTTLE_COOLDOWN = 30.0  # in seconds
+# Per-key request quota per minute (None = no client-side quota)
+KEY_POOL_REQUESTS_PER_MINUTE = {
+    "gemini": None,
+    "google_tts": 1000,
+    "elevenlabs": None,
+}
+
+# Retry-related constants (per-provider attempts and base delays are below)
+# Upper bound for a single backoff delay
+RETRY_MAX_DELAY = 8.0  # in seconds
+# Retries one job may spend across all of its provider calls; a job that
+# keeps failing gives up instead of retrying every line
+RETRY_BUDGET_PER_JOB = 20
+# Attempts for a script generation LLM call (retried only before any output was used)
+LLM_RETRY_ATTEMPTS = 2
+LLM_RETRY_BASE_DELAY = 1.0  # in seconds
+
+# Background TTS pipeline-related constants
+# Lines of one job synthesized concurrently (provider rate limits still apply)
+TTS_PIPELINE_CONCURRENCY = 4
+# Request batching: short lines of one speaker (and consecutive lines of the
+# same speaker) are synthesized in one provider request and the audio is split
+# back into lines at the pauses between them
+TTS_BATCHING_ENABLED = True
+TTS_BATCH_SHORT_LINE_CHARS = 80  # Lines up to this length are batched with other lines of the speaker
+TTS_BATCH_MAX_CHARS = 600  # Text per batched request
+TTS_BATCH_MAX_LINES = 6
+# Joins the lines of a batch; a paragraph break makes the voice pause
+TTS_BATCH_SEPARATOR = "\n\n"
+# Pauses at least this long (and this many dB below the average level) are
+# candidate split points
+TTS_BATCH_MIN_SILENCE_MS = 250
+TTS_BATCH_SILENCE_THRESH_DB = 16
+# A split is rejected (and the lines synthesized one by one) if a line's audio is
+# more than this factor longer or shorter than its share of the text, give or
+# take the slack (short lines carry relatively long pauses)
+TTS_BATCH_MAX_DURATION_RATIO = 2.0
+TTS_BATCH_DURATION_SLACK_MS = 400
+# Long lines are split at sentence boundaries and the chunks synthesized
+# concurrently, then joined with a short pause
+TTS_CHUNKING_ENABLED = True
+TTS_CHUNK_TARGET_CHARS = 400  # Lines longer than this are split into chunks of about this size
+TTS_CHUNK_PAUSE_MS = 150
+# Input limit of one TTS request in UTF-8 bytes (Google Cloud TTS rejects
+# more than 5,000 bytes; ElevenLabs counts characters, so bytes are a safe bound)
+TTS_MAX_INPUT_BYTES = {
+    "google_tts": 5000,
+    "elevenlabs": 10000,
+    "local": 5000,
+}
+# Lines that failed are retried once more (with failover to the other
+# provider) after the rest of the job; if some still fail, the completed
+# segments are kept in a checkpoint so retrying the job only synthesizes those
+JOB_CHECKPOINT_DIR = os.path.join(TEMP_AUDIO_DIR, "checkpoints")
+JOB_CHECKPOINT_MAX_AGE_HOURS = 24
+# A resubmitted form cancels the request it submitted before in the same tab, if
+# that is still running (other requests of the user are not affected)
+CANCEL_SUPERSEDED_JOBS = True
+# Scheduler lanes: at most `concurrency` jobs of a lane run at once per worker,
+# so quick script-only jobs never queue behind long synthesis jobs. At shared
+# provider rate limits, requests of a lane with a higher priority go first.
+JOB_LANES = {
+    "script": {"concurrency": 8, "priority": 2},  # /generate-script
+    "synthesis": {"concurrency": 3, "priority": 1},  # /generate, /synthesize-audio
+    "batch": {"concurrency": 1, "priority": 0},  # Jobs started outside a web request
+}
+# How long a job waits for a free slot in its lane before it is turned away
+JOB_LANE_MAX_WAIT_SECONDS = 120
+# Upper bound for a whole job, from the request to the packaged podcast
+JOB_DEADLINE_SECONDS = 600
+# Time kept back for the stages after each stage: a stage's calls time out
+# (and stop retrying) once only this much of the job's time is left
+JOB_STAGE_RESERVES = {
+    "ingest": 300,  # Script, synthesis and packaging
+    "script": 150,  # Synthesis and packaging
+    "synthesis": 30,  # Encoding and packaging
+}
+# Optional steps are skipped when less than this is left for them
+JOB_OPTIONAL_STEP_SECONDS = {
+    "refine": 30,  # Script refinement, out of the script stage's time
+    "stems": 20,  # Separate speaker tracks
+    "h5p": 10,  # H5P package
+}
+# Hedged TTS requests: if a line takes longer than the provider's recent
+# p95 latency, send it again and keep whichever response arrives first
+TTS_HEDGING_ENABLED = True
+TTS_HEDGE_PERCENTILE = 95
+# At most this fraction of extra requests (duplicates are billed too). A p95
+# trigger fires for ~5% of requests, so leave headroom above that
+TTS_HEDGE_BUDGET = 0.1
+# Latency samples kept per provider, and needed before the first hedge
+TTS_HEDGE_WINDOW = 200
+TTS_HEDGE_MIN_SAMPLES = 20
+# Circuit breaker per TTS provider: open after at least THRESHOLD provider
+# errors (timeouts, 5xx) that make up FAILURE_RATE of the requests within
+# WINDOW seconds, then probe again after RESET_TIMEOUT seconds
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5
+CIRCUIT_BREAKER_WINDOW = 30  # in seconds
+CIRCUIT_BREAKER_RESET_TIMEOUT = 20  # in seconds
+# While a provider's circuit is open, synthesize with the other configured
+# provider using a voice of the same gender
+TTS_FAILOVER_ENABLED = True
+
 # Google Cloud Text-to-Speech API-related constants
-GOOGLE_CLOUD_API_KEY = os.getenv("GOOGLE_CLOUD_API_KEY")
+# One or more API keys; GOOGLE_CLOUD_API_KEYS takes a comma-separated pool
+GOOGLE_CLOUD_API_KEYS = _api_keys("GOOGLE_CLOUD_API_KEYS", "GOOGLE_CLOUD_API_KEY")
+GOOGLE_CLOUD_API_KEY = GOOGLE_CLOUD_API_KEYS[0] if GOOGLE_CLOUD_API_KEYS else None
 GOOGLE_TTS_RETRY_ATTEMPTS = 3
-GOOGLE_TTS_RETRY_DELAY = 5  # in seconds
+GOOGLE_TTS_RETRY_BASE_DELAY = 0.5  # in seconds, doubled per attempt with jitter
+# Async clients per API key, each with its own gRPC connection, sized so the
+# most concurrent requests one key allows are spread over the connections
+GOOGLE_TTS_REQUESTS_PER_CHANNEL = 8
+GOOGLE_TTS_POOL_SIZE = math.ceil(RATE_LIMITS["google_tts"]["max_concurrency"] / GOOGLE_TTS_REQUESTS_PER_CHANNEL)
+# Pooled clients: replaced after this many provider errors in a row; opening
+# all connections when a pool is first used gives up after the timeout
+CLIENT_POOL_MAX_FAILURES = 3
+CLIENT_POOL_WARM_UP_TIMEOUT = 10  # in seconds
 
 # ElevenLabs API-related constants
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+# One or more API keys; ELEVENLABS_API_KEYS takes a comma-separated pool
+ELEVENLABS_API_KEYS = _api_keys("ELEVENLABS_API_KEYS", "ELEVENLABS_API_KEY")
+ELEVENLABS_API_KEY = ELEVENLABS_API_KEYS[0] if ELEVENLABS_API_KEYS else None
 ELEVENLABS_RETRY_ATTEMPTS = 3
-ELEVENLABS_RETRY_DELAY = 5  # in seconds
+ELEVENLABS_RETRY_BASE_DELAY = 1.0  # in seconds, doubled per attempt with jitter
+ELEVENLABS_STREAM_CHUNK_BYTES = 16384  # Audio is written to disk in chunks of this size as it streams in
+
+# Local TTS provider: synthetic speech-like audio without API calls, for
+# benchmarks and load tests (voice_provider "local")
+# Send every job to one provider regardless of the form, e.g. "local"
+TTS_PROVIDER_OVERRIDE = os.getenv("TTS_PROVIDER_OVERRIDE")
+LOCAL_TTS_LATENCY = float(os.getenv("LOCAL_TTS_LATENCY", "0.3"))  # in seconds per request
+LOCAL_TTS_LATENCY_PER_CHAR = float(os.getenv("LOCAL_TTS_LATENCY_PER_CHAR", "0.001"))  # in seconds
+LOCAL_TTS_LATENCY_JITTER = float(os.getenv("LOCAL_TTS_LATENCY_JITTER", "0.3"))  # +/- fraction of the latency
+# Share of requests that fail with a 503 / are throttled with a 429
+LOCAL_TTS_ERROR_RATE = float(os.getenv("LOCAL_TTS_ERROR_RATE", "0"))
+LOCAL_TTS_THROTTLE_RATE = float(os.getenv("LOCAL_TTS_THROTTLE_RATE", "0"))
+LOCAL_TTS_SEED = int(os.getenv("LOCAL_TTS_SEED", "0"))  # Latency and error injection are repeatable per seed
+LOCAL_TTS_CHARS_PER_SECOND = 15  # Speaking rate of the synthetic audio
+LOCAL_TTS_RETRY_ATTEMPTS = 3
+LOCAL_TTS_RETRY_BASE_DELAY = 0.1  # in seconds, doubled per attempt with jitter
 
 # ElevenLabs voice configurations
 # Based on available voices from ElevenLabs API
@@ -565,7 +828,7 @@ SUPPORTED_LANGUAGES = [
 # Jina Reader-related constants
 JINA_READER_URL = "https://r.jina.ai/"
 JINA_RETRY_ATTEMPTS = 3
-JINA_RETRY_DELAY = 5  # in seconds
+JINA_RETRY_BASE_DELAY = 1.0  # in seconds, doubled per attempt with jitter
 
 # UI-related constants
 UI_DESCRIPTION = """
@@ -0,0 +1,71 @@
+"""
+deadline.py - One time limit per job, shared out between its stages
+
+Without a job-wide limit, per-call timeouts and retries add up: a podcast with
+a slow LLM and a flaky TTS provider could run for tens of minutes. A Deadline is
+set when a job starts (JOB_DEADLINE_SECONDS) and every stage derives its
+timeouts from what is left of it:
+
+    timeout = deadline.timeout(60, "synthesis")   # at most 60s, less if the job is behind
+    if deadline.allows(JOB_OPTIONAL_STEP_SECONDS["h5p"]):
+        ...                                         # optional steps only when there is time
+
+Each stage keeps back JOB_STAGE_RESERVES[stage] seconds for the stages after
+it, so a slow script still leaves time to synthesize and package the podcast.
+"""
+
+import time
+from typing import Dict, Optional
+
+from constants import JOB_DEADLINE_SECONDS, JOB_STAGE_RESERVES
+
+
+class DeadlineExceeded(Exception):
+    """A stage of a job has no time left."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"The podcast took too long and was stopped during {stage}. Please try again.")
+        self.stage = stage
+
+
+class Deadline:
+    """The time a job must finish by."""
+
+    def __init__(self, seconds: float = JOB_DEADLINE_SECONDS, reserves: Dict[str, float] = JOB_STAGE_RESERVES):
+        self.seconds = seconds
+        self.reserves = reserves
+        self.expires_at = time.monotonic() + seconds
+
+    def restart(self) -> None:
+        """Start the time limit again, e.g. once a queued job starts running."""
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self, stage: Optional[str] = None) -> float:
+        """Return the seconds left for the job, or for a stage after its reserve."""
+        left = self.expires_at - time.monotonic()
+        if stage is not None:
+            left -= self.reserves.get(stage, 0)
+        return max(0.0, left)
+
+    def timeout(self, limit: Optional[float], stage: str) -> float:
+        """
+        Return the timeout for one call of a stage.
+
+        Args:
+            limit: The call's own timeout, or None for no limit
+            stage: Stage the call belongs to
+
+        Returns:
+            limit, shortened to the time left for the stage
+
+        Raises:
+            DeadlineExceeded: The stage has no time left
+        """
+        left = self.remaining(stage)
+        if left <= 0:
+            raise DeadlineExceeded(stage)
+        return left if limit is None else min(limit, left)
+
+    def allows(self, seconds: float, stage: Optional[str] = None) -> bool:
+        """Return True if at least seconds are left (for stage, if given)."""
+        return self.remaining(stage) >= seconds
@@ -0,0 +1,132 @@
+"""
+dialogue_repair.py - Deterministic clean-up of LLM-generated dialogue
+
+Fixes the problems the second "improve the dialogue" LLM call was mostly used
+for, without another round trip:
+- speaker labels are normalized to the configured host and guest names
+- empty items and items without any words are dropped
+- tiny items are merged into the preceding line of the same speaker
+- consecutive lines of the same speaker are merged while above the item target
+
+Merging rewrites lines. Lines of a streamed draft that were already sent to TTS
+are passed as `locked` and never merged, so their audio stays valid; the other
+lines are merged as usual.
+"""
+
+import re
+from typing import Collection, List, Optional, Tuple
+
+from loguru import logger
+
+from constants import DIALOGUE_REPAIR_MIN_CHARS
+from schema import DialogueItem
+
+# Matches any letter or digit in any script
+_WORD_CHARACTER = re.compile(r"\w")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and reduce it to its words, e.g. "Sam (Host):" -> "sam host"."""
+    return " ".join(re.findall(r"\w+", (name or "").lower()))
+
+
+def _contains_name(label: str, name: str) -> bool:
+    """Return True if name appears in label as whole words."""
+    return bool(name) and f" {name} " in f" {label} "
+
+
+def normalize_speaker(speaker: str, host_name: str, guest_name: str) -> str:
+    """Map a speaker label produced by the LLM to the host or guest name."""
+    label = normalize_name(speaker)
+    host = normalize_name(host_name)
+    guest = normalize_name(guest_name)
+    if label == guest:
+        return guest_name
+    if label == host:
+        return host_name
+    # Labels such as "Host", "Sam (host)" or "Host Sam"; a guest label that
+    # merely contains the host's name (host "Al", guest "Alex") stays the guest
+    if "host" in label.split() or (_contains_name(label, host) and not _contains_name(label, guest)):
+        return host_name
+    return guest_name
+
+
+def repair_dialogue_item(item: DialogueItem, host_name: str, guest_name: str) -> Optional[DialogueItem]:
+    """Normalize a single item, or return None if it has nothing to say."""
+    text = (item.text or "").strip()
+    if not _WORD_CHARACTER.search(text):
+        return None
+    return DialogueItem(speaker=normalize_speaker(item.speaker, host_name, guest_name), text=text)
+
+
+def _mergeable(first: DialogueItem, second: DialogueItem, locked: Collection[Tuple[str, str]]) -> bool:
+    """Return True if two items have the same speaker and neither was already sent to TTS."""
+    return (
+        first.speaker == second.speaker
+        and (first.speaker, first.text) not in locked
+        and (second.speaker, second.text) not in locked
+    )
+
+
+def _merge_tiny_items(items: List[DialogueItem], locked: Collection[Tuple[str, str]] = ()) -> List[DialogueItem]:
+    """Merge very short items into the preceding line when it has the same speaker."""
+    merged = []
+    for item in items:
+        if merged and len(item.text) < DIALOGUE_REPAIR_MIN_CHARS and _mergeable(merged[-1], item, locked):
+            merged[-1] = DialogueItem(speaker=item.speaker, text=f"{merged[-1].text} {item.text}")
+        else:
+            merged.append(item)
+    return merged
+
+
+def _merge_consecutive_speakers(
+    items: List[DialogueItem],
+    max_items: int,
+    locked: Collection[Tuple[str, str]] = ()
+) -> List[DialogueItem]:
+    """Merge back-to-back lines of the same speaker until the dialogue fits max_items."""
+    merged = list(items)
+    i = len(merged) - 1
+    while len(merged) > max_items and i > 0:
+        if _mergeable(merged[i - 1], merged[i], locked):
+            merged[i - 1] = DialogueItem(
+                speaker=merged[i].speaker, text=f"{merged[i - 1].text} {merged[i].text}"
+            )
+            del merged[i]
+        i -= 1
+    return merged
+
+
+def repair_dialogue(dialogue, host_name: str, guest_name: str, locked: Collection[Tuple[str, str]] = ()):
+    """Return a repaired copy of an LLM dialogue object.
+
+    Args:
+        dialogue: A ShortDialogue, MediumDialogue or LongDialogue instance
+        host_name: Configured host name
+        guest_name: Configured guest name
+        locked: (speaker, text) of repaired lines already sent to TTS; they are
+            kept as they are rather than merged
+
+    Returns:
+        A copy of the dialogue with normalized speakers and cleaned-up items
+    """
+    items = []
+    for item in dialogue.dialogue:
+        repaired = repair_dialogue_item(item, host_name, guest_name)
+        if repaired is None:
+            logger.warning(f"Dropping empty dialogue item from speaker '{item.speaker}'")
+            continue
+        items.append(repaired)
+
+    items = _merge_tiny_items(items, locked)
+
+    min_items, max_items = getattr(dialogue, "item_target", (0, len(items)))
+    if len(items) > max_items:
+        items = _merge_consecutive_speakers(items, max_items, locked)
+    if len(items) > max_items:
+        logger.warning(f"Dialogue has {len(items)} items, above the target of {max_items}")
+    elif len(items) < min_items:
+        logger.warning(f"Dialogue has {len(items)} items, below the target of {min_items}")
+
+    logger.info(f"Repaired dialogue: {len(dialogue.dialogue)} items in, {len(items)} items out")
+    return dialogue.model_copy(update={"dialogue": items, "name_of_guest": guest_name})
@@ -0,0 +1,103 @@
+"""
+dialogue_stream.py - Incremental parsing of streamed dialogue JSON
+
+The LLM streams its structured output as raw JSON text. DialogueStreamParser
+scans the text as it arrives and hands back every item of the top-level
+"dialogue" array as soon as its closing brace has been received, so
+downstream stages (TTS, UI preview) can start before the response is complete.
+"""
+
+import json
+from typing import List
+
+from loguru import logger
+from pydantic import ValidationError
+
+from schema import DialogueItem
+
+
+class DialogueStreamParser:
+    """Incrementally extract completed DialogueItems from streamed JSON text."""
+
+    def __init__(self, array_key: str = "dialogue"):
+        self.array_key = array_key
+        self.buffer = ""
+        self._pos = 0              # Next character of the buffer to scan
+        self._stack = []           # Open JSON containers ('{' or '[')
+        self._in_string = False
+        self._escape = False
+        self._string_start = None  # Buffer index of the current top-level string
+        self._last_key = None      # Last string closed directly inside the root object
+        self._in_array = False     # True while scanning the target array
+        self._item_start = None    # Buffer index of the current item's '{'
+        self.items: List[DialogueItem] = []
+
+    def feed(self, chunk: str) -> List[DialogueItem]:
+        """Add a chunk of streamed text and return the items it completed."""
+        self.buffer += chunk
+        completed = []
+
+        while self._pos < len(self.buffer):
+            i = self._pos
+            char = self.buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_start is not None:
+                        try:
+                            self._last_key = json.loads(self.buffer[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_key = None
+                        self._string_start = None
+                continue
+
+            if char == '"':
+                self._in_string = True
+                # Only strings directly inside the root object can be keys we care about
+                if self._stack == ["{"]:
+                    self._string_start = i
+            elif char == "{":
+                if self._in_array and self._stack == ["{", "["]:
+                    self._item_start = i
+                self._stack.append("{")
+            elif char == "[":
+                if self._stack == ["{"] and self._last_key == self.array_key:
+                    self._in_array = True
+                self._stack.append("[")
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._item_start is not None and self._stack == ["{", "["]:
+                    item = self._parse_item(self.buffer[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+                elif char == "]" and self._in_array and self._stack == ["{"]:
+                    self._in_array = False
+
+        return completed
+
+    def _parse_item(self, raw: str):
+        """Validate a raw JSON object as a DialogueItem, skipping malformed ones."""
+        try:
+            return DialogueItem.model_validate_json(raw)
+        except (ValidationError, ValueError) as e:
+            logger.warning(f"Skipping malformed streamed dialogue item: {e}")
+            return None
+
+    @property
+    def text(self) -> str:
+        """The full response text received so far, without code fences."""
+        response_text = self.buffer.strip()
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]
+        return response_text.strip()
@@ -0,0 +1,134 @@
+"""
+hedging.py - Hedged requests to cut the tail latency of TTS calls
+
+A podcast waits for its slowest line, so one TTS response in the provider's
+long tail delays the whole job. A Hedger tracks the recent latency of a
+provider; when a request is still running after the observed p95, it sends the
+same request again and uses whichever response arrives first, cancelling the
+other. Hedges are limited to a fraction of all requests (the hedge budget) and
+are only sent while the provider has spare capacity (rate limiter or key pool).
+
+    response = await get_hedger("google_tts").run(synthesize, google_tts_key_pool)
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from constants import (
+    TTS_HEDGE_BUDGET,
+    TTS_HEDGE_MIN_SAMPLES,
+    TTS_HEDGE_PERCENTILE,
+    TTS_HEDGE_WINDOW,
+)
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful requests to one provider."""
+
+    def __init__(self, window: int = TTS_HEDGE_WINDOW, min_samples: int = TTS_HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Return the given latency percentile, or None until enough samples exist."""
+        if len(self._samples) < self.min_samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[max(0, math.ceil(percent / 100 * len(samples)) - 1)]
+
+
+class HedgeBudget:
+    """Allow at most max_ratio hedged requests per request sent."""
+
+    def __init__(self, max_ratio: float = TTS_HEDGE_BUDGET):
+        self.max_ratio = max_ratio
+        self.requests = 0
+        self.hedges = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget; return False if it would exceed max_ratio."""
+        if self.hedges + 1 > self.max_ratio * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+
+class Hedger:
+    """Send a duplicate request when the first one is slower than the provider's p95."""
+
+    def __init__(self, name: str, percentile: float = TTS_HEDGE_PERCENTILE, max_ratio: float = TTS_HEDGE_BUDGET):
+        self.name = name
+        self.percentile = percentile
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget(max_ratio)
+
+    async def _timed(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        started_at = time.monotonic()
+        result = await operation()
+        self.latency.record(time.monotonic() - started_at)
+        return result
+
+    async def run(self, operation: Callable[[], Awaitable[Any]], capacity=None) -> Any:
+        """Await operation(), hedging it with a second call if it is slow.
+
+        Args:
+            operation: Creates the request coroutine; called once per attempt
+            capacity: AdaptiveRateLimiter or KeyPool of the provider; no hedge is
+                sent while its has_spare_capacity() is False
+
+        Returns:
+            The result of the first attempt that succeeds
+        """
+        self.budget.record_request()
+        hedge_after = self.latency.percentile(self.percentile)
+        primary = asyncio.ensure_future(self._timed(operation))
+        tasks = [primary]
+        try:
+            if hedge_after is None:
+                return await primary
+
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return primary.result()
+            if capacity is not None and not capacity.has_spare_capacity():
+                return await primary
+            if not self.budget.try_spend():
+                return await primary
+
+            logger.info(f"{self.name} request still running after p{self.percentile:g} ({hedge_after:.2f}s), sending a hedged request")
+            tasks.append(asyncio.ensure_future(self._timed(operation)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Both attempts failed; report the original request's error
+            return primary.result()
+        finally:
+            # The losing (or abandoned) attempt is cancelled, freeing its rate limit slot
+            for task in tasks:
+                task.cancel()
+
+
+_hedgers: Dict[str, Hedger] = {}
+
+
+def get_hedger(provider: str) -> Hedger:
+    """Return the process-wide hedger for a provider. Call this from the engine loop."""
+    hedger = _hedgers.get(provider)
+    if hedger is None:
+        hedger = Hedger(provider)
+        _hedgers[provider] = hedger
+    return hedger
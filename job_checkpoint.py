@@ -0,0 +1,145 @@
+"""
+job_checkpoint.py - Completed audio of a failed job, kept for a retry
+
+When some lines of a podcast still fail after their retries, the job fails but
+the segments of every other line are already paid for. A checkpoint keeps them
+on disk together with what is needed to finish the job: the script, the names
+and the job's voice plan (so retried lines get the same voices). Retrying the
+job loads the checkpoint and synthesizes only the lines that have no segment:
+
+    save_checkpoint(job_id, voice_plan, script, params, segments, owner=user_id)
+    checkpoint = load_checkpoint(job_id)
+
+A checkpoint records the user whose job it was; only they may resume it.
+
+Segments are keyed by (role, text) rather than the speaker label, because a
+generated script and its re-parsed markdown label the same speaker differently.
+Checkpoints expire after JOB_CHECKPOINT_MAX_AGE_HOURS.
+"""
+
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+from pydub import AudioSegment
+
+from constants import JOB_CHECKPOINT_DIR, JOB_CHECKPOINT_MAX_AGE_HOURS
+from voice_plan import VoicePlan
+
+# Job IDs are uuid4 hex strings; anything else never names a checkpoint
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ResumableJobError(ValueError):
+    """A job failed after saving a checkpoint; retrying job_id resumes it."""
+
+    def __init__(self, message: str, job_id: str):
+        super().__init__(message)
+        self.job_id = job_id
+
+
+@dataclass
+class JobCheckpoint:
+    """What a retry needs to finish a failed job."""
+
+    job_id: str
+    voice_plan: VoicePlan
+    script: str  # Markdown script, as produced for the script editor
+    params: dict  # language, host_name and guest_name
+    segments: Dict[Tuple[str, str], AudioSegment]  # (role, text) -> audio
+    owner: Optional[str] = None  # User who started the job
+
+
+def _checkpoint_dir(job_id: str) -> str:
+    if not _JOB_ID.match(job_id or ""):
+        raise ValueError(f"Invalid job ID: {job_id!r}")
+    return os.path.join(JOB_CHECKPOINT_DIR, job_id)
+
+
+def save_checkpoint(
+    job_id: str,
+    voice_plan: VoicePlan,
+    script: str,
+    params: dict,
+    segments: Dict[Tuple[str, str], AudioSegment],
+    owner: Optional[str] = None
+) -> None:
+    """
+    Store the completed segments of a failed job.
+
+    Args:
+        job_id: ID of the failed job; a retry passes it to load_checkpoint()
+        voice_plan: Voice plan of the job
+        script: Markdown script of the job
+        params: Names and language of the job
+        segments: Audio of every completed line, by (role, text)
+        owner: User who started the job, if any
+    """
+    directory = _checkpoint_dir(job_id)
+    os.makedirs(directory, exist_ok=True)
+
+    entries = []
+    for index, ((role, text), segment) in enumerate(segments.items()):
+        filename = f"segment_{index:04d}.wav"
+        # WAV needs no encoder and loads back exactly
+        segment.export(os.path.join(directory, filename), format="wav")
+        entries.append({'role': role, 'text': text, 'file': filename})
+
+    with open(os.path.join(directory, "checkpoint.json"), 'w', encoding='utf-8') as f:
+        json.dump({
+            'job_id': job_id,
+            'voice_plan': asdict(voice_plan),
+            'script': script,
+            'params': params,
+            'segments': entries,
+            'owner': owner,
+        }, f)
+    logger.info(f"Saved checkpoint of job {job_id} with {len(entries)} completed lines")
+
+
+def load_checkpoint(job_id: str) -> Optional[JobCheckpoint]:
+    """Return the checkpoint of a failed job, or None if there is none (or it expired)."""
+    directory = _checkpoint_dir(job_id)
+    path = os.path.join(directory, "checkpoint.json")
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    segments = {
+        (entry['role'], entry['text']): AudioSegment.from_wav(os.path.join(directory, entry['file']))
+        for entry in data['segments']
+    }
+    return JobCheckpoint(
+        job_id=data['job_id'],
+        voice_plan=VoicePlan(**data['voice_plan']),
+        script=data['script'],
+        params=data['params'],
+        segments=segments,
+        owner=data.get('owner'),
+    )
+
+
+def delete_checkpoint(job_id: str) -> None:
+    """Remove a checkpoint once its job finished."""
+    shutil.rmtree(_checkpoint_dir(job_id), ignore_errors=True)
+
+
+def cleanup_checkpoints(max_age_hours: float = JOB_CHECKPOINT_MAX_AGE_HOURS) -> None:
+    """Remove checkpoints that were not retried in time."""
+    if not os.path.isdir(JOB_CHECKPOINT_DIR):
+        return
+    max_age_seconds = max_age_hours * 3600
+    for name in os.listdir(JOB_CHECKPOINT_DIR):
+        directory = os.path.join(JOB_CHECKPOINT_DIR, name)
+        try:
+            if time.time() - os.path.getmtime(directory) > max_age_seconds:
+                shutil.rmtree(directory, ignore_errors=True)
+        except OSError:
+            continue
+
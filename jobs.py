@@ -0,0 +1,304 @@
+"""
+jobs.py - Per-job state shared by every provider call of a podcast job
+
+A JobContext is created when a job starts and made current with job_scope().
+Provider code on any thread or engine task reads it with current_job(), so
+per-job limits do not have to be passed through every function:
+
+    with job_scope(JobContext()):
+        generate_podcast(...)
+
+Entry points decorated with @job_entry_point start their own job unless the
+caller already made one current.
+
+The async engine copies the caller's context into every coroutine it runs.
+
+Jobs can be cancelled, e.g. when the user leaves the page or resubmits:
+
+    cancel_job(job_id, owner=user_id)
+    cancel_submitted_job(user_id, client_id)  # By the ID the page submitted it under
+
+Cancelling sets the job's CancellationToken. Every coroutine the job submitted
+to the async engine is cancelled with it (stopping its LLM and TTS requests),
+and the job raises JobCancelled at its next check_cancelled(). Running jobs are
+registered per process, so a job can only be cancelled by the worker running it.
+
+Every job also has a Deadline (deadline.py); provider calls take their timeouts
+from stage_timeout() and optional steps check has_time_for().
+
+Jobs run in scheduler lanes (JOB_LANES), each with its own concurrency limit,
+so a script-only job does not wait for a free slot behind synthesis jobs:
+
+    with lane_scope(JobContext(), "script"):
+        generate_script_only(...)
+
+A job's deadline starts when it leaves the lane's queue.
+"""
+
+import functools
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from constants import JOB_LANE_MAX_WAIT_SECONDS, JOB_LANES
+from deadline import Deadline
+from retry_policy import RetryBudget
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while it was running."""
+
+    def __init__(self, message: str = "The job was cancelled."):
+        super().__init__(message)
+
+
+class CancellationToken:
+    """A flag that is set once and runs callbacks when it is."""
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """Set the flag and run every registered callback."""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Run callback on cancel (now, if already cancelled); returns a function that unregisters it."""
+        with self._lock:
+            if not self._cancelled:
+                callback_id = self._next_id
+                self._next_id += 1
+                self._callbacks[callback_id] = callback
+                return lambda: self._remove_callback(callback_id)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback_id: int) -> None:
+        with self._lock:
+            self._callbacks.pop(callback_id, None)
+
+    def raise_if_cancelled(self) -> None:
+        """Raise JobCancelled if the flag is set."""
+        if self._cancelled:
+            raise JobCancelled()
+
+
+@dataclass
+class JobContext:
+    """State of one podcast or script generation job."""
+
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    retry_budget: RetryBudget = field(default_factory=RetryBudget)
+    cancellation: CancellationToken = field(default_factory=CancellationToken)
+    deadline: Deadline = field(default_factory=Deadline)
+    owner: Optional[str] = None  # User who started the job; only they may cancel it
+    client_id: Optional[str] = None  # ID the page submitted the job under; unique per owner only
+    lane: Optional[str] = None  # Scheduler lane the job runs in
+
+    @property
+    def priority(self) -> int:
+        """Priority of the job's requests at shared provider limits."""
+        return JOB_LANES.get(self.lane, {}).get("priority", 0)
+
+
+_current_job: ContextVar[Optional[JobContext]] = ContextVar("current_job", default=None)
+
+# Jobs running in this process, by job ID
+_active_jobs: Dict[str, JobContext] = {}
+_active_jobs_lock = threading.Lock()
+
+
+def current_job() -> Optional[JobContext]:
+    """Return the job the calling code runs for, if any."""
+    return _current_job.get()
+
+
+def check_cancelled() -> None:
+    """Raise JobCancelled if the current job was cancelled; call between stages of a job."""
+    job = current_job()
+    if job is not None:
+        job.cancellation.raise_if_cancelled()
+
+
+def stage_timeout(limit: Optional[float], stage: str) -> Optional[float]:
+    """Return a call's timeout within the current job's time for stage; raises DeadlineExceeded if none is left."""
+    job = current_job()
+    if job is None:
+        return limit
+    return job.deadline.timeout(limit, stage)
+
+
+def has_time_for(seconds: float, stage: Optional[str] = None) -> bool:
+    """Return True if the current job has at least seconds left (for stage, if given)."""
+    job = current_job()
+    return job is None or job.deadline.allows(seconds, stage)
+
+
+@contextmanager
+def job_scope(job: JobContext) -> Iterator[JobContext]:
+    """Make job the current (and a cancellable) job for the duration of the block."""
+    token = _current_job.set(job)
+    with _active_jobs_lock:
+        _active_jobs[job.job_id] = job
+    try:
+        yield job
+    finally:
+        with _active_jobs_lock:
+            if _active_jobs.get(job.job_id) is job:
+                del _active_jobs[job.job_id]
+        _current_job.reset(token)
+
+
+def cancel_job(job_id: str, owner: Optional[str] = None) -> bool:
+    """Cancel a running job; with owner, only if that user started it. Returns True if it was running."""
+    with _active_jobs_lock:
+        job = _active_jobs.get(job_id)
+    if job is None or (owner is not None and job.owner != owner):
+        return False
+    logger.info(f"Cancelling job {job_id}")
+    job.cancellation.cancel()
+    return True
+
+
+def cancel_submitted_job(owner: str, client_id: str) -> bool:
+    """Cancel the running job a user's page submitted under client_id. Returns True if there was one."""
+    with _active_jobs_lock:
+        job_ids = [job.job_id for job in _active_jobs.values() if job.owner == owner and job.client_id == client_id]
+    return any([cancel_job(job_id, owner) for job_id in job_ids])
+
+
+class JobLaneBusy(Exception):
+    """A job found no free slot in its lane in time."""
+
+    def __init__(self, lane: str):
+        super().__init__("The server is busy with other podcasts. Please try again in a few minutes.")
+        self.lane = lane
+
+
+class _Lane:
+    """Running and waiting jobs of one lane."""
+
+    def __init__(self, name: str, concurrency: int, priority: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.priority = priority
+        self.running = 0
+        self.waiting = 0
+
+
+class JobScheduler:
+    """Admits jobs into lanes, each with its own concurrency limit."""
+
+    def __init__(self, lanes: Dict[str, dict] = JOB_LANES, max_wait: float = JOB_LANE_MAX_WAIT_SECONDS):
+        self.lanes = {name: _Lane(name, **config) for name, config in lanes.items()}
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+
+    def _wake(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, job: JobContext, lane: str) -> Iterator[JobContext]:
+        """
+        Run the block once lane has a free slot for job.
+
+        Args:
+            job: The job to run
+            lane: Name of a lane in JOB_LANES
+
+        Raises:
+            JobLaneBusy: No slot became free within max_wait seconds
+            JobCancelled: The job was cancelled while it waited
+        """
+        state = self.lanes[lane]
+        job.lane = lane
+        started_at = time.monotonic()
+        # A cancelled job stops waiting at once
+        unregister = job.cancellation.add_callback(self._wake)
+        try:
+            with self._condition:
+                state.waiting += 1
+                try:
+                    self._condition.wait_for(
+                        lambda: job.cancellation.cancelled or state.running < state.concurrency,
+                        self.max_wait
+                    )
+                finally:
+                    state.waiting -= 1
+                job.cancellation.raise_if_cancelled()
+                if state.running >= state.concurrency:
+                    logger.warning(f"Job {job.job_id} found no free slot in the {lane} lane within {self.max_wait}s")
+                    raise JobLaneBusy(lane)
+                state.running += 1
+        finally:
+            unregister()
+
+        waited = time.monotonic() - started_at
+        if waited >= 1:
+            logger.info(f"Job {job.job_id} waited {waited:.1f}s for a slot in the {lane} lane")
+        # The deadline covers the work, not the wait in the queue
+        job.deadline.restart()
+        try:
+            yield job
+        finally:
+            with self._condition:
+                state.running -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> List[dict]:
+        """Return the running and waiting jobs of every lane."""
+        with self._condition:
+            return [
+                {'lane': state.name, 'running': state.running, 'waiting': state.waiting, 'concurrency': state.concurrency}
+                for state in self.lanes.values()
+            ]
+
+
+# One scheduler per worker process
+scheduler = JobScheduler()
+
+
+@contextmanager
+def lane_scope(job: JobContext, lane: str) -> Iterator[JobContext]:
+    """Make job current and run the block in lane once the lane has room."""
+    with job_scope(job), scheduler.admit(job, lane):
+        yield job
+
+
+def job_entry_point(func: Callable) -> Callable:
+    """Run func as a job: inside the caller's current job, or a new one in the batch lane."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lane_scope(JobContext(), "batch") if current_job() is None else nullcontext():
+            try:
+                return func(*args, **kwargs)
+            except CancelledError:
+                # Work of a cancelled job was cancelled under it; report why
+                check_cancelled()
+                raise
+    return wrapper
@@ -0,0 +1,171 @@
+"""
+key_pool.py - Pools of API keys for the LLM and TTS providers
+
+Each provider can be configured with several API keys (GEMINI_API_KEYS,
+GOOGLE_CLOUD_API_KEYS, ELEVENLABS_API_KEYS), so throughput is not capped by one
+key's quota. A KeyPool hands out one key per request:
+- "round_robin" cycles through the keys, "least_loaded" picks the key with the
+  fewest requests in flight (then the fewest in the last minute)
+- a key at its per-minute request quota is skipped until the minute rolls over
+- a key the provider throttled (429 / RESOURCE_EXHAUSTED) is taken out of
+  rotation for KEY_POOL_THROTTLE_COOLDOWN seconds, unless it is the last usable
+  key: then (e.g. with a single key) only its rate limiter's pause applies
+
+    with google_tts_keys.lease() as api_key:
+        ...call the provider with api_key...
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from loguru import logger
+
+from constants import KEY_POOL_STRATEGY, KEY_POOL_THROTTLE_COOLDOWN
+from rate_limiter import get_rate_limiter, is_throttle_error
+
+_QUOTA_WINDOW_SECONDS = 60
+
+
+class KeyPoolExhaustedError(Exception):
+    """Raised when every key of a pool is cooling down or at its quota."""
+
+    # Reported like a throttle response, so callers back off and retry
+    code = 429
+
+
+class _KeyState:
+    """Usage of one key in a pool."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.in_flight = 0
+        self.requests = 0
+        self.throttles = 0
+        self.cooldown_until = 0.0
+        self.recent = deque()  # Start times of requests in the quota window
+
+
+class KeyPool:
+    """Distribute requests over a provider's API keys."""
+
+    def __init__(
+        self,
+        provider: str,
+        keys: List[str],
+        strategy: str = KEY_POOL_STRATEGY,
+        requests_per_minute: Optional[int] = None,
+        throttle_cooldown: float = KEY_POOL_THROTTLE_COOLDOWN
+    ):
+        self.provider = provider
+        self.strategy = strategy
+        self.requests_per_minute = requests_per_minute
+        self.throttle_cooldown = throttle_cooldown
+        self._states = [_KeyState(key) for key in dict.fromkeys(keys)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def keys(self) -> List[str]:
+        return [state.key for state in self._states]
+
+    def _available(self, now: float) -> List[_KeyState]:
+        """Return the keys that are neither cooling down nor at their quota."""
+        available = []
+        for state in self._states:
+            while state.recent and state.recent[0] < now - _QUOTA_WINDOW_SECONDS:
+                state.recent.popleft()
+            if state.cooldown_until > now:
+                continue
+            if self.requests_per_minute is not None and len(state.recent) >= self.requests_per_minute:
+                continue
+            available.append(state)
+        return available
+
+    def acquire(self) -> str:
+        """Pick a key for one request. Pair every call with release()."""
+        with self._lock:
+            now = time.monotonic()
+            available = self._available(now)
+            if not available:
+                raise KeyPoolExhaustedError(
+                    f"All {len(self._states)} {self.provider} API keys are throttled or at their quota"
+                )
+            if self.strategy == "least_loaded":
+                state = min(available, key=lambda s: (s.in_flight, len(s.recent)))
+            else:
+                # Round robin: the first available key at or after the cursor
+                order = self._states[self._next:] + self._states[:self._next]
+                state = next(s for s in order if s in available)
+                self._next = (self._states.index(state) + 1) % len(self._states)
+            state.in_flight += 1
+            state.requests += 1
+            state.recent.append(now)
+            return state.key
+
+    def release(self, key: str, throttled: bool = False) -> None:
+        """Return a key; a throttled key is taken out of rotation for a while."""
+        with self._lock:
+            state = next(s for s in self._states if s.key == key)
+            state.in_flight -= 1
+            if throttled:
+                state.throttles += 1
+                now = time.monotonic()
+                # Cooling down the last usable key would fail every request of the
+                # provider; its rate limiter already pauses and slows down instead
+                if not any(other is not state for other in self._available(now)):
+                    logger.warning(
+                        f"{self.provider} API key #{self._states.index(state) + 1} was throttled; "
+                        f"it is the last usable key, so it stays in rotation"
+                    )
+                    return
+                state.cooldown_until = now + self.throttle_cooldown
+                logger.warning(
+                    f"{self.provider} API key #{self._states.index(state) + 1} was throttled, "
+                    f"taking it out of rotation for {self.throttle_cooldown:g}s"
+                )
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        """Hold a key for the duration of one request."""
+        key = self.acquire()
+        try:
+            yield key
+        except Exception as e:
+            self.release(key, throttled=is_throttle_error(e))
+            raise
+        except BaseException:
+            self.release(key)
+            raise
+        else:
+            self.release(key)
+
+    def has_spare_capacity(self) -> bool:
+        """Return True if some usable key's rate limiter could start a request now.
+
+        Call this from the engine loop.
+        """
+        with self._lock:
+            available = [state.key for state in self._available(time.monotonic())]
+        return any(get_rate_limiter(self.provider, key).has_spare_capacity() for key in available)
+
+    def stats(self) -> List[dict]:
+        """Return per-key usage, with keys identified by position only."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    'key': index + 1,
+                    'in_flight': state.in_flight,
+                    'requests': state.requests,
+                    'requests_last_minute': len(state.recent),
+                    'throttles': state.throttles,
+                    'cooling_down': state.cooldown_until > now,
+                }
+                for index, state in enumerate(self._states)
+            ]
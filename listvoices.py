@@ -1,29 +1,29 @@
-from google.cloud import texttospeech
+"""
+listvoices.py - Print the voices Google Cloud Text-to-Speech offers
+
+Uses the same pooled async clients as synthesis (tts_providers.py), so no
+separate client is created at import time.
+
+    python listvoices.py [language_code]
+"""
 
+import sys
 
-# Local imports
-from constants import (
-    GOOGLE_CLOUD_API_KEY
-)
+from google.cloud import texttospeech
+
+from async_engine import engine
+from utils import get_tts_provider
 
-# Initialize Google Cloud Text-to-Speech client
-# Only initialize if API key is available
-google_tts_client = None
-if GOOGLE_CLOUD_API_KEY:
-    google_tts_client = texttospeech.TextToSpeechClient(
-        client_options={"api_key": GOOGLE_CLOUD_API_KEY}
-    )
 
-def list_voices():
+def list_voices(language_code: str = None):
     """Lists the available voices."""
-    client = texttospeech.TextToSpeechClient(
-        client_options={"api_key": GOOGLE_CLOUD_API_KEY}
-    )
+    provider = get_tts_provider("google_tts")
+    provider.check_configured()
 
     # Performs the list voices request
-    voices = client.list_voices()
+    voices = engine.run(provider.fetch_voices(language_code), timeout=90)
 
-    for voice in voices.voices:
+    for voice in voices:
         # Display the voice's name. Example: tpc-vocoded
         print(f"Name: {voice.name}")
 
@@ -39,4 +39,6 @@ def list_voices():
         # Display the natural sample rate hertz for this voice. Example: 24000
         print(f"Natural Sample Rate Hertz: {voice.natural_sample_rate_hertz}\n")
 
-list_voices()
\ No newline at end of file
+
+if __name__ == "__main__":
+    list_voices(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,138 @@
+"""
+llm_cache.py - Provider-side caching of source documents for LLM calls
+
+The same source text (up to CHARACTER_LIMIT characters) is often sent to
+several LLM calls: the outline and every section of a long-form script, and the
+draft of a script regenerated from a document that is already cached. A
+single-call script from a new document reads its source only once, so it is
+sent inline rather than cached. SourceContextCache registers the text once with
+the provider and hands back a cache name that later calls reference instead of
+re-sending the text. Cached contents belong to the API key that created them,
+so entries are kept per key and a call must reference a cache created with its
+own key.
+
+Backends:
+- GeminiContextCacheBackend: Gemini context caching via client.caches
+- LocalContextCacheBackend: in-process stand-in for tests and offline runs
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from constants import CONTEXT_CACHE_MIN_CHARS, CONTEXT_CACHE_TTL_SECONDS
+from llm_providers import format_source_document
+
+# Stop referencing a cache this long before the provider expires it
+_EXPIRY_MARGIN_SECONDS = 60
+
+
+class GeminiContextCacheBackend:
+    """Register cached contents with the Gemini API."""
+
+    def __init__(self, clients: Dict[str, Any]):
+        self.clients = clients
+
+    def create(self, model: str, text: str, ttl_seconds: int, api_key: Optional[str] = None) -> str:
+        """Cache the source document and return the provider's cache name."""
+        client = self.clients.get(api_key) or next(iter(self.clients.values()))
+        cached_content = client.caches.create(
+            model=model,
+            config={
+                "contents": [format_source_document(text)],
+                "ttl": f"{ttl_seconds}s",
+                "display_name": "podcast-source",
+            }
+        )
+        return cached_content.name
+
+
+class LocalContextCacheBackend:
+    """In-process stand-in for provider caching, for tests and offline runs.
+
+    A fake LLM client can resolve a cache name back to its text with get_text.
+    """
+
+    def __init__(self):
+        self.contents: Dict[str, str] = {}
+        self.created = 0
+
+    def create(self, model: str, text: str, ttl_seconds: int, api_key: Optional[str] = None) -> str:
+        """Store the source document and return a synthetic cache name."""
+        name = f"cachedContents/local-{uuid.uuid4().hex}"
+        self.contents[name] = format_source_document(text)
+        self.created += 1
+        return name
+
+    def get_text(self, name: str) -> Optional[str]:
+        """Return the cached document for a cache name."""
+        return self.contents.get(name)
+
+
+class SourceContextCache:
+    """Reuse one provider-side cache per (model, source text) until it expires."""
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS,
+        min_chars: int = CONTEXT_CACHE_MIN_CHARS
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_chars = min_chars
+        self._entries: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
+        self._key_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str, text: str, api_key: Optional[str] = None) -> Optional[str]:
+        """Return a cache name for the text and API key, creating it on first use.
+
+        Returns None when the text is too short to be worth caching or the
+        provider refuses it; callers then send the text inline.
+        """
+        if len(text) < self.min_chars:
+            return None
+
+        key = (model, hashlib.sha256(text.encode("utf-8")).hexdigest(), api_key or "")
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Parallel calls for the same source wait for a single cache creation
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                logger.debug(f"Reusing cached source context {entry[0]}")
+                return entry[0]
+
+            try:
+                name = self.backend.create(model, text, self.ttl_seconds, api_key)
+            except Exception as e:
+                logger.warning(f"Failed to cache source context, sending it inline: {e}")
+                return None
+
+            expires_at = time.time() + self.ttl_seconds - _EXPIRY_MARGIN_SECONDS
+            self._entries[key] = (name, expires_at)
+            logger.info(f"Cached source context ({len(text)} characters) as {name}")
+            return name
+
+    def has(self, model: str, text: str) -> bool:
+        """Return True if the text is cached for model with any API key and not about to expire."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            return any(
+                key[0] == model and key[1] == digest and entry[1] > now
+                for key, entry in self._entries.items()
+            )
+
+    def invalidate(self, name: str) -> None:
+        """Forget a cache the provider no longer knows about."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[0] == name:
+                    del self._entries[key]
@@ -0,0 +1,277 @@
+"""
+llm_providers.py - LLM backends for script generation
+
+call_llm talks to an LLMProvider instead of a specific SDK, so script generation
+can run against Gemini or any server that speaks the OpenAI chat completions
+API (vLLM, llama.cpp, Ollama, ...), including a self-hosted model on our own
+hardware or a local stand-in for offline runs. Both providers return raw JSON
+text (or an already parsed object); call_llm validates it into the same
+pydantic dialogue models.
+
+Providers are asynchronous and run on the shared async engine.
+
+Providers:
+- GeminiProvider: Google Gen AI SDK (async client), supports provider-side context caching
+  and a pool of API keys
+- OpenAICompatibleProvider: plain HTTP against /chat/completions over the pooled HTTP client
+"""
+
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+from async_engine import engine
+from constants import (
+    GEMINI_TEMPERATURE,
+    OPENAI_COMPAT_API_KEY,
+    OPENAI_COMPAT_BASE_URL,
+    OPENAI_COMPAT_MODEL,
+)
+
+
+@dataclass
+class LLMUsage:
+    """Token counts reported by the provider for one call."""
+
+    input_tokens: Optional[int] = None
+    cached_input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    thinking_tokens: Optional[int] = None
+
+
+@dataclass
+class LLMRequest:
+    """Everything a provider needs to make one structured-output call."""
+
+    model: str
+    system_prompt: str
+    source_text: Optional[str]
+    dialogue_format: Any
+    max_output_tokens: int
+    thinking_budget: Optional[int] = None
+    cached_content: Optional[str] = None
+    timeout: Optional[float] = None
+    api_key: Optional[str] = None  # Key leased from the provider's key pool
+
+
+@dataclass
+class LLMResult:
+    """The response of a non-streaming call."""
+
+    text: str
+    parsed: Any = None
+    usage: Optional[LLMUsage] = None
+
+
+@dataclass
+class LLMChunk:
+    """A piece of a streamed response; usage is set on chunks that carry it."""
+
+    text: str
+    usage: Optional[LLMUsage] = None
+
+
+def format_source_document(text: str) -> str:
+    """Format the source text the same way whether it is cached or sent inline."""
+    return f"User Input:\n{text}"
+
+
+class LLMProvider(ABC):
+    """Interface for structured-output LLM backends."""
+
+    name = "base"
+    supports_context_cache = False
+    # KeyPool the caller leases request keys from, if the provider has one
+    key_pool = None
+
+    @abstractmethod
+    async def generate(self, request: LLMRequest) -> LLMResult:
+        """Make a single structured-output call."""
+
+    @abstractmethod
+    def generate_stream(self, request: LLMRequest) -> AsyncIterator[LLMChunk]:
+        """Make a structured-output call and yield the response text as it arrives."""
+
+    def resolve_model(self, model: str) -> str:
+        """Map a routed model name to the name this provider serves."""
+        return model
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the Gen AI SDK."""
+
+    name = "gemini"
+    supports_context_cache = True
+
+    def __init__(self, clients: Dict[str, Any], key_pool=None):
+        """
+        Args:
+            clients: genai.Client per API key
+            key_pool: KeyPool over the same keys
+        """
+        self.clients = clients
+        self.key_pool = key_pool
+
+    def client(self, api_key: Optional[str] = None):
+        """Return the client for a leased key, or the first client."""
+        return self.clients.get(api_key) or next(iter(self.clients.values()))
+
+    def _contents(self, request: LLMRequest) -> str:
+        """Build the prompt; a cached source document already precedes it."""
+        if request.cached_content or request.source_text is None:
+            return request.system_prompt
+        return f"{request.system_prompt}\n\n{format_source_document(request.source_text)}"
+
+    def _config(self, request: LLMRequest) -> dict:
+        """Build the generation config for structured output."""
+        config = {
+            "temperature": GEMINI_TEMPERATURE,
+            "max_output_tokens": request.max_output_tokens,
+            "response_mime_type": "application/json",
+            "response_schema": request.dialogue_format,
+        }
+        if request.thinking_budget is not None:
+            config["thinking_config"] = {"thinking_budget": request.thinking_budget}
+        if request.cached_content:
+            config["cached_content"] = request.cached_content
+        return config
+
+    @staticmethod
+    def _usage(usage_metadata) -> Optional[LLMUsage]:
+        """Convert Gemini usage metadata to LLMUsage."""
+        if usage_metadata is None:
+            return None
+        return LLMUsage(
+            input_tokens=usage_metadata.prompt_token_count,
+            cached_input_tokens=usage_metadata.cached_content_token_count,
+            output_tokens=usage_metadata.candidates_token_count,
+            thinking_tokens=usage_metadata.thoughts_token_count,
+        )
+
+    async def generate(self, request: LLMRequest) -> LLMResult:
+        response = await self.client(request.api_key).aio.models.generate_content(
+            model=request.model,
+            contents=self._contents(request),
+            config=self._config(request)
+        )
+        return LLMResult(
+            text=response.text or "",
+            parsed=getattr(response, 'parsed', None),
+            usage=self._usage(getattr(response, 'usage_metadata', None)),
+        )
+
+    async def generate_stream(self, request: LLMRequest) -> AsyncIterator[LLMChunk]:
+        stream = await self.client(request.api_key).aio.models.generate_content_stream(
+            model=request.model,
+            contents=self._contents(request),
+            config=self._config(request),
+        )
+        async for chunk in stream:
+            yield LLMChunk(
+                text=chunk.text or "",
+                usage=self._usage(getattr(chunk, 'usage_metadata', None)),
+            )
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any server implementing the OpenAI chat completions API."""
+
+    name = "openai_compatible"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, model: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+
+    def resolve_model(self, model: str) -> str:
+        # Self-hosted servers serve their own model names, not the Gemini routes
+        return self.model or model
+
+    def _payload(self, request: LLMRequest, stream: bool) -> dict:
+        """Build the chat completions request body with a JSON schema response format."""
+        messages = [{"role": "system", "content": request.system_prompt}]
+        if request.source_text is not None:
+            messages.append({"role": "user", "content": format_source_document(request.source_text)})
+        payload = {
+            "model": request.model,
+            "messages": messages,
+            "temperature": GEMINI_TEMPERATURE,
+            "max_tokens": request.max_output_tokens,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": request.dialogue_format.__name__,
+                    "schema": request.dialogue_format.model_json_schema(),
+                },
+            },
+            "stream": stream,
+        }
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    @staticmethod
+    def _usage(usage: Optional[dict]) -> Optional[LLMUsage]:
+        """Convert an OpenAI-style usage block to LLMUsage."""
+        if not usage:
+            return None
+        return LLMUsage(
+            input_tokens=usage.get("prompt_tokens"),
+            cached_input_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+            output_tokens=usage.get("completion_tokens"),
+            thinking_tokens=(usage.get("completion_tokens_details") or {}).get("reasoning_tokens"),
+        )
+
+    async def generate(self, request: LLMRequest) -> LLMResult:
+        # The pooled client keeps connections to the (often local) server alive
+        response = await engine.http_client().post(
+            f"{self.base_url}/chat/completions",
+            json=self._payload(request, stream=False),
+            headers=self._headers(),
+            timeout=request.timeout
+        )
+        response.raise_for_status()
+        data = response.json()
+        return LLMResult(
+            text=data["choices"][0]["message"]["content"] or "",
+            usage=self._usage(data.get("usage")),
+        )
+
+    async def generate_stream(self, request: LLMRequest) -> AsyncIterator[LLMChunk]:
+        async with engine.http_client().stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            json=self._payload(request, stream=True),
+            headers=self._headers(),
+            timeout=request.timeout
+        ) as response:
+            response.raise_for_status()
+            # Server-sent events: one "data: {...}" line per chunk, then "data: [DONE]"
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                choices = event.get("choices") or []
+                text = (choices[0].get("delta") or {}).get("content") or "" if choices else ""
+                yield LLMChunk(text=text, usage=self._usage(event.get("usage")))
+
+
+def create_llm_provider(name: str, gemini_clients: Optional[Dict[str, Any]] = None, gemini_key_pool=None) -> Optional[LLMProvider]:
+    """Create the configured LLM provider, or None if it is not configured."""
+    if name == "openai_compatible":
+        if not OPENAI_COMPAT_BASE_URL:
+            return None
+        return OpenAICompatibleProvider(OPENAI_COMPAT_BASE_URL, OPENAI_COMPAT_API_KEY, OPENAI_COMPAT_MODEL)
+    if not gemini_clients:
+        return None
+    return GeminiProvider(gemini_clients, gemini_key_pool)
@@ -6,9 +6,10 @@ Podcast generation module containing the core logic for generating podcasts from
 import glob
 import os
 import time
+from dataclasses import replace
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import List, Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 import random
 import uuid
 
@@ -25,10 +26,13 @@ from constants import (
     ERROR_MESSAGE_TOO_LONG,
     GRADIO_CACHE_DIR,
     GRADIO_CLEAR_CACHE_OLDER_THAN,
+    JOB_OPTIONAL_STEP_SECONDS,
     get_voice_assignments,
     get_custom_voice_assignments,
-    GOOGLE_CLOUD_API_KEY,
+    SCRIPT_REFINEMENT_ENABLED,
+    SPECULATIVE_SYNTHESIS_ENABLED,
     TEMP_AUDIO_DIR,
+    TTS_PROVIDER_OVERRIDE,
 )
 from prompts import (
     LANGUAGE_MODIFIER,
@@ -41,8 +45,12 @@ from schema import (
     ShortDialogue, MediumDialogue, LongDialogue,
     get_dialogue_schema
 )
-from utils import generate_podcast_audio, generate_script, parse_url, generate_vtt_content, clear_voice_cache
+from utils import generate_script, get_tts_provider, parse_url, generate_vtt_content
 from h5p_generator import generate_h5p_package
+from tts_pipeline import LineSynthesisError, TTSPipeline
+from jobs import check_cancelled, current_job, has_time_for, job_entry_point
+from job_checkpoint import JobCheckpoint, ResumableJobError, delete_checkpoint, load_checkpoint, save_checkpoint
+from voice_plan import VoicePlan, resolve_voice_plan
 
 from pydub import AudioSegment
 
@@ -99,26 +107,42 @@ def generate_separate_channels(audio_segments, dialogue_items, speaker_names):
     return host_channel, guest_channel
 
 
-def generate_podcast(
-    files: List[str],
-    url: Optional[str],
-    question: Optional[str],
-    tone: Optional[str],
-    length: Optional[str],
-    language: str,
-    host_name: Optional[str] = "Sam",
-    guest_name: Optional[str] = None,
-    voice_provider: str = "google_tts",
-    host_voice: str = "random",
-    guest_voice: str = "random"
-) -> Tuple[str, str, str, str, str, str]:
-    """Generate the audio and transcript from the PDFs and/or URL."""
+def _has_time_for_step(step: str) -> bool:
+    """Return True if the job has time for an optional step; logs the skip otherwise."""
+    if has_time_for(JOB_OPTIONAL_STEP_SECONDS[step]):
+        return True
+    logger.warning(f"Skipping {step}: not enough time left for this job")
+    return False
 
-    text = ""
+
+def _export_separate_channels(audio_file_path: str, audio_segments, dialogue_items, speaker_names) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Export a track per speaker next to the podcast file.
+
+    The tracks are optional: they are skipped if the job is running out of time.
+
+    Returns:
+        tuple: (host_channel_path, guest_channel_path), both None if not created
+    """
+    if not _has_time_for_step("stems"):
+        return None, None
     
-    # Clear voice cache to ensure fresh voice assignments for this podcast
-    clear_voice_cache()
+    host_channel, guest_channel = generate_separate_channels(audio_segments, dialogue_items, speaker_names)
+    host_channel_path = audio_file_path.replace('.mp3', '_host.mp3')
+    guest_channel_path = audio_file_path.replace('.mp3', '_guest.mp3')
     
+    try:
+        host_channel.export(host_channel_path, format="mp3")
+        guest_channel.export(guest_channel_path, format="mp3")
+        logger.info(f"Generated separate channel files: {host_channel_path}, {guest_channel_path}")
+    except (PermissionError, OSError) as e:
+        logger.warning(f"Failed to create separate channel files: {e}")
+        return None, None
+    return host_channel_path, guest_channel_path
+
+
+def _plan_voices(language: str, voice_provider: str, host_voice: str, guest_voice: str, host_name: Optional[str]) -> VoicePlan:
+    """Resolve the host and guest voice selections of a job into its voice plan."""
     # Import voice manager for new voice system
     from voice_manager import voice_manager
     
@@ -133,7 +157,6 @@ def generate_podcast(
         voice_assignments = get_custom_voice_assignments(host_gender, guest_gender, voice_provider)
     else:
         # Use specific voice IDs
-        # Get voice data for host
         host_voice_data = voice_manager.get_voice_by_id(voice_provider, language, host_voice)
         guest_voice_data = voice_manager.get_voice_by_id(voice_provider, language, guest_voice)
         
@@ -143,26 +166,119 @@ def generate_podcast(
         if not guest_voice_data:
             guest_voice_data = voice_manager.get_random_voice(voice_provider, language, 'random')
         
-        # Create voice assignments in the format expected by the audio generation
-        if voice_provider == "elevenlabs":
-            voice_assignments = {
-                "Host (Sam)": {language: [host_voice_data['id']] if host_voice_data else []},
-                "Guest": {language: [guest_voice_data['id']] if guest_voice_data else []}
-            }
-        else:  # google_tts
-            voice_assignments = {
-                "Host (Sam)": {language: [host_voice_data['id']] if host_voice_data else []},
-                "Guest": {language: [guest_voice_data['id']] if guest_voice_data else []}
-            }
-    
-    # Log voice assignments (now using list-based structure)
-    host_voice_sample = list(voice_assignments['Host (Sam)'].values())[0][0] if voice_assignments['Host (Sam)'] else "Unknown"
-    guest_voice_sample = list(voice_assignments['Guest'].values())[0][0] if voice_assignments['Guest'] else "Unknown"
-    logger.info(f"Voice assignments for this podcast: Host={'Female' if 'HD-F' in host_voice_sample or 'Achernar' in host_voice_sample or 'Aoede' in host_voice_sample else 'Male'}, Guest={'Female' if 'HD-F' in guest_voice_sample or 'Achernar' in guest_voice_sample or 'Aoede' in guest_voice_sample else 'Male'}")
-
-    # Require Google Cloud TTS API key
-    if not GOOGLE_CLOUD_API_KEY:
-        raise ValueError("Google Cloud TTS API key is required. Please set GOOGLE_CLOUD_API_KEY environment variable.")
+        logger.info(f"Host voice: {host_voice_data}")
+        logger.info(f"Guest voice: {guest_voice_data}")
+        voice_assignments = {
+            "Host (Sam)": {language: [host_voice_data['id']] if host_voice_data else []},
+            "Guest": {language: [guest_voice_data['id']] if guest_voice_data else []}
+        }
+    
+    voice_plan = resolve_voice_plan(voice_assignments, language, voice_provider, host_name)
+    if TTS_PROVIDER_OVERRIDE:
+        # Keep the chosen voices; the override provider (e.g. local) synthesizes any voice ID
+        voice_plan = replace(voice_plan, provider=TTS_PROVIDER_OVERRIDE)
+    return voice_plan
+
+
+def _format_script(dialogue, host_name: str, guest_name: str) -> str:
+    """Convert dialogue lines to the markdown script format of the script editor."""
+    script_content = f"# Podcast Script\n\n"
+    script_content += f"**Host:** {host_name}\n"
+    script_content += f"**Guest:** {guest_name}\n\n"
+    script_content += "---\n\n"
+    
+    for line in dialogue:
+        # With proper Pydantic models, we should have objects directly
+        speaker = line.speaker
+        text = line.text
+        
+        # Debug logging to see what we're getting
+        logger.info(f"Processing dialogue line - Speaker: '{speaker}', Text: '{text[:50]}...' (length: {len(text)})")
+        
+        # More flexible speaker matching
+        if speaker and text:  # Only process if both speaker and text exist
+            # Check if this is the host
+            if 'host' in speaker.lower() or speaker.lower() == host_name.lower():
+                speaker_name = host_name
+            else:
+                speaker_name = guest_name
+            
+            script_content += f"**{speaker_name}:** {text}\n\n"
+        else:
+            logger.warning(f"Skipping empty dialogue line - Speaker: '{speaker}', Text length: {len(text)}")
+    
+    return script_content
+
+
+def _collect_audio(
+    tts_pipeline: TTSPipeline,
+    lines: List[Tuple[str, str]],
+    script: Callable[[], str],
+    params: dict
+) -> List[AudioSegment]:
+    """
+    Wait for the audio of every line of a job.
+
+    If some lines cannot be synthesized, the audio of all other lines is saved
+    as a checkpoint of the job, so retrying it only synthesizes the failed lines.
+
+    Args:
+        tts_pipeline: Pipeline the lines were submitted to
+        lines: (speaker, text) lines in script order
+        script: Returns the markdown script of the job (only called on failure)
+        params: language, host_name and guest_name of the job
+
+    Returns:
+        One AudioSegment per line
+    """
+    try:
+        return tts_pipeline.results(lines)
+    except LineSynthesisError as e:
+        voice_plan = tts_pipeline.voice_plan
+        job = current_job()
+        job_id = job.job_id
+        try:
+            save_checkpoint(
+                job_id,
+                voice_plan,
+                script(),
+                params,
+                {(voice_plan.role(speaker), text): segment for (speaker, text), segment in e.segments.items()},
+                owner=job.owner
+            )
+        except Exception as save_error:
+            logger.error(f"Failed to save checkpoint of job {job_id}: {save_error}")
+            raise ValueError(f"{e}. Please try again.") from e
+        raise ResumableJobError(
+            f"{e}. The other lines were kept: retry to synthesize only the missing ones.", job_id
+        ) from e
+
+
+@job_entry_point
+def generate_podcast(
+    files: List[str],
+    url: Optional[str],
+    question: Optional[str],
+    tone: Optional[str],
+    length: Optional[str],
+    language: str,
+    host_name: Optional[str] = "Sam",
+    guest_name: Optional[str] = None,
+    voice_provider: str = "google_tts",
+    host_voice: str = "random",
+    guest_voice: str = "random",
+    refine_script: Optional[bool] = None
+) -> Tuple[str, str, str, str, str, str]:
+    """Generate the audio and transcript from the PDFs and/or URL."""
+
+    text = ""
+    refine = SCRIPT_REFINEMENT_ENABLED if refine_script is None else refine_script
+    
+    # Choose the voices once; every line of this job uses the same plan
+    voice_plan = _plan_voices(language, voice_provider, host_voice, guest_voice, host_name)
+
+    # Require the credentials of the TTS provider
+    get_tts_provider(voice_plan.provider).check_configured()
 
     # Check if at least one input is provided
     if not files and not url:
@@ -193,6 +309,9 @@ def generate_podcast(
     if len(text) > CHARACTER_LIMIT:
         raise ValueError(ERROR_MESSAGE_TOO_LONG)
 
+    # Stop here if the user left while the input was read
+    check_cancelled()
+
     # Modify the system prompt based on the user input
     modified_system_prompt = SYSTEM_PROMPT
 
@@ -221,77 +340,103 @@ def generate_podcast(
         schema_type = "long"
     
     DialogueSchema = get_dialogue_schema(schema_type)
-    llm_output = generate_script(
-        modified_system_prompt, 
-        text, 
-        DialogueSchema,
-        host_name=host_name,
-        guest_name=final_guest_name
-    )
 
-    # Set guest name in output
-    if guest_name:
-        llm_output.name_of_guest = guest_name
-    elif not hasattr(llm_output, 'name_of_guest') or not llm_output.name_of_guest:
-        llm_output.name_of_guest = final_guest_name
+    # Synthesis runs in the background so it can overlap with script generation
+    tts_pipeline = TTSPipeline(voice_plan)
+
+    def queue_draft_line(item) -> bool:
+        """Start synthesizing a streamed line before the rest of the script exists; returns False if it waits."""
+        # Short lines wait for the full script so they can share a request
+        if item.speaker and item.text and not tts_pipeline.defers(item.text):
+            tts_pipeline.submit(item.speaker, item.text, speculative=True)
+            return True
+        return False
 
-    logger.info(f"Generated dialogue: {llm_output}")
+    # Draft lines are final in single-pass mode; with refinement they are speculative
+    stream_draft = SPECULATIVE_SYNTHESIS_ENABLED or not refine
+
+    try:
+        llm_output = generate_script(
+            modified_system_prompt, 
+            text, 
+            DialogueSchema,
+            host_name=host_name,
+            guest_name=final_guest_name,
+            refine=refine,
+            on_draft_item=queue_draft_line if stream_draft else None
+        )
+        check_cancelled()
+
+        # Set guest name in output
+        if guest_name:
+            llm_output.name_of_guest = guest_name
+        elif not hasattr(llm_output, 'name_of_guest') or not llm_output.name_of_guest:
+            llm_output.name_of_guest = final_guest_name
+
+        logger.info(f"Generated dialogue: {llm_output}")
+
+        # Queue every final line up front; streamed lines are already in flight
+        tts_pipeline.submit_lines([
+            (line.speaker, line.text) for line in llm_output.dialogue if line.speaker and line.text
+        ])
+        tts_pipeline.discard_speculation()
+    except BaseException:
+        # No line will be used: stop the speculative synthesis and remove its files
+        tts_pipeline.close(remove_files=True)
+        raise
 
     # Process the dialogue
-    audio_segments = []
     dialogue_items = []
+    lines = []
     transcript = ""
     total_characters = 0
 
-    for line in llm_output.dialogue:
-        # With proper Pydantic models, we should have objects directly
-        line_speaker = line.speaker
-        line_text = line.text
+    with tts_pipeline:
+        for line in llm_output.dialogue:
+            # With proper Pydantic models, we should have objects directly
+            line_speaker = line.speaker
+            line_text = line.text
+                
+            # Debug logging to see what we're getting
+            logger.info(f"Processing dialogue line - Speaker: '{line_speaker}', Text: '{line_text[:50]}...' (length: {len(line_text)})")
             
-        # Debug logging to see what we're getting
-        logger.info(f"Processing dialogue line - Speaker: '{line_speaker}', Text: '{line_text[:50]}...' (length: {len(line_text)})")
-        
-        # Skip empty dialogue items
-        if not line_speaker or not line_text:
-            logger.warning(f"Skipping empty dialogue line - Speaker: '{line_speaker}', Text length: {len(line_text)}")
-            continue
+            # Skip empty dialogue items
+            if not line_speaker or not line_text:
+                logger.warning(f"Skipping empty dialogue line - Speaker: '{line_speaker}', Text length: {len(line_text)}")
+                continue
             
-        logger.info(f"Generating audio for {line_speaker}: {line_text}")
-        
-        # More flexible speaker matching for transcript
-        if 'host' in line_speaker.lower() or line_speaker.lower() == host_name.lower():
-            speaker_name = host_name
-        else:
-            speaker_name = llm_output.name_of_guest
-            
-        speaker = f"**{speaker_name}**: {line_text}"
-        transcript += speaker + "\n\n"
-        total_characters += len(line_text)
-
-        # Google TTS expects full language names (e.g., "German")
-        language_for_tts = language
+            # More flexible speaker matching for transcript
+            if 'host' in line_speaker.lower() or line_speaker.lower() == host_name.lower():
+                speaker_name = host_name
+            else:
+                speaker_name = llm_output.name_of_guest
+                
+            speaker = f"**{speaker_name}**: {line_text}"
+            transcript += speaker + "\n\n"
+            total_characters += len(line_text)
 
-        # Get audio file path
-        audio_file_path = generate_podcast_audio(
-            line_text, line_speaker, language_for_tts, voice_assignments, voice_provider
+            lines.append((line_speaker, line_text))
+            
+            # Store dialogue item for VTT generation
+            dialogue_items.append({
+                'speaker': speaker_name,
+                'text': line_text
+            })
+
+        # Wait for the background synthesis of every line
+        audio_segments = _collect_audio(
+            tts_pipeline,
+            lines,
+            lambda: _format_script(llm_output.dialogue, host_name, llm_output.name_of_guest),
+            {'language': language, 'host_name': host_name, 'guest_name': llm_output.name_of_guest}
         )
-        # Read the audio file into an AudioSegment
-        audio_segment = AudioSegment.from_file(audio_file_path)
-        audio_segments.append(audio_segment)
-        
-        # Store dialogue item for VTT generation
-        dialogue_items.append({
-            'speaker': speaker_name,
-            'text': line_text
-        })
+
+    # Don't encode and package a podcast nobody is waiting for
+    check_cancelled()
 
     # Concatenate all audio segments
     combined_audio = sum(audio_segments)
 
-    # Generate separate channels for each speaker
-    speaker_names = {'host': host_name, 'guest': llm_output.name_of_guest}
-    host_channel, guest_channel = generate_separate_channels(audio_segments, dialogue_items, speaker_names)
-
     # Export the combined audio to a temporary file
     temporary_directory = GRADIO_CACHE_DIR
     try:
@@ -309,18 +454,11 @@ def generate_podcast(
     except (PermissionError, OSError) as e:
         raise ValueError(f"Permission denied: Unable to create audio file '{temp_file_path}'. Please ensure the application has write permissions: {e}")
     
-    # Export separate channel files
-    host_channel_path = temp_file_path.replace('.mp3', '_host.mp3')
-    guest_channel_path = temp_file_path.replace('.mp3', '_guest.mp3')
-    
-    try:
-        host_channel.export(host_channel_path, format="mp3")
-        guest_channel.export(guest_channel_path, format="mp3")
-        logger.info(f"Generated separate channel files: {host_channel_path}, {guest_channel_path}")
-    except (PermissionError, OSError) as e:
-        logger.warning(f"Failed to create separate channel files: {e}")
-        host_channel_path = None
-        guest_channel_path = None
+    # Generate and export separate channels for each speaker
+    speaker_names = {'host': host_name, 'guest': llm_output.name_of_guest}
+    host_channel_path, guest_channel_path = _export_separate_channels(
+        temp_file_path, audio_segments, dialogue_items, speaker_names
+    )
 
     # Generate VTT file
     vtt_content = generate_vtt_content(dialogue_items, audio_segments)
@@ -342,9 +480,9 @@ def generate_podcast(
         ):
             os.remove(file)
 
-    # Generate H5P package if VTT file was created successfully
+    # Generate H5P package if VTT file was created successfully (and the job is not behind)
     h5p_file_path = None
-    if vtt_file_path:
+    if vtt_file_path and _has_time_for_step("h5p"):
         try:
             # Create a title for the H5P package
             h5p_title = f"Podcast - {host_name} & {llm_output.name_of_guest}"
@@ -368,6 +506,7 @@ def generate_podcast(
     return temp_file_path, transcript, vtt_file_path, h5p_file_path, host_channel_path, guest_channel_path
 
 
+@job_entry_point
 def generate_script_only(
     files: List[str],
     url: Optional[str],
@@ -377,10 +516,12 @@ def generate_script_only(
     language: str,
     host_name: Optional[str] = "Sam",
     guest_name: Optional[str] = None,
+    refine_script: Optional[bool] = None,
 ) -> Tuple[str, dict]:
     """Generate only the script without audio synthesis."""
     
     text = ""
+    refine = SCRIPT_REFINEMENT_ENABLED if refine_script is None else refine_script
 
     # Check if at least one input is provided
     if not files and not url:
@@ -444,7 +585,8 @@ def generate_script_only(
         text, 
         DialogueSchema,
         host_name=host_name,
-        guest_name=final_guest_name
+        guest_name=final_guest_name,
+        refine=refine
     )
 
     # Set guest name in output
@@ -454,30 +596,7 @@ def generate_script_only(
         llm_output.name_of_guest = final_guest_name
 
     # Convert dialogue to markdown format for editing
-    script_content = f"# Podcast Script\n\n"
-    script_content += f"**Host:** {host_name}\n"
-    script_content += f"**Guest:** {llm_output.name_of_guest}\n\n"
-    script_content += "---\n\n"
-    
-    for line in llm_output.dialogue:
-        # With proper Pydantic models, we should have objects directly
-        speaker = line.speaker
-        text = line.text
-        
-        # Debug logging to see what we're getting
-        logger.info(f"Processing dialogue line - Speaker: '{speaker}', Text: '{text[:50]}...' (length: {len(text)})")
-        
-        # More flexible speaker matching
-        if speaker and text:  # Only process if both speaker and text exist
-            # Check if this is the host
-            if 'host' in speaker.lower() or speaker.lower() == host_name.lower():
-                speaker_name = host_name
-            else:
-                speaker_name = llm_output.name_of_guest
-            
-            script_content += f"**{speaker_name}:** {text}\n\n"
-        else:
-            logger.warning(f"Skipping empty dialogue line - Speaker: '{speaker}', Text length: {len(text)}")
+    script_content = _format_script(llm_output.dialogue, host_name, llm_output.name_of_guest)
 
     # Store generation parameters for later use
     generation_params = {
@@ -490,6 +609,7 @@ def generate_script_only(
     return script_content, generation_params
 
 
+@job_entry_point
 def synthesize_audio_from_script(
     script_content: str,
     language: str,
@@ -497,53 +617,17 @@ def synthesize_audio_from_script(
     guest_name: str,
     voice_provider: str = "google_tts",
     host_voice: str = "random",
-    guest_voice: str = "random"
+    guest_voice: str = "random",
+    checkpoint: Optional[JobCheckpoint] = None
 ) -> Tuple[str, str, str, str, str, str]:
-    """Synthesize audio from an edited script."""
-    
-    # Clear voice cache to ensure fresh voice assignments for this podcast
-    clear_voice_cache()
+    """Synthesize audio from an edited script, reusing the audio of a checkpoint if given."""
     
-    # Import voice manager for new voice system
-    from voice_manager import voice_manager
-    
-    # Handle voice assignments using new voice system
-    if host_voice in ['random', 'male', 'female'] or guest_voice in ['random', 'male', 'female']:
-        # Use legacy gender-based assignment for compatibility
-        host_gender = 'male' if host_voice == 'male' else 'female' if host_voice == 'female' else 'random'
-        guest_gender = 'male' if guest_voice == 'male' else 'female' if guest_voice == 'female' else 'random'
-        
-        # Get voice assignments based on user preferences and provider
-        from constants import get_custom_voice_assignments
-        voice_assignments = get_custom_voice_assignments(host_gender, guest_gender, voice_provider)
+    # Choose the voices once; every line of this job uses the same plan. A
+    # retried job keeps its voices, so the kept lines match the new ones
+    if checkpoint is not None:
+        voice_plan = checkpoint.voice_plan
     else:
-        # Use specific voice IDs
-        # Get voice data for host
-        host_voice_data = voice_manager.get_voice_by_id(voice_provider, language, host_voice)
-        guest_voice_data = voice_manager.get_voice_by_id(voice_provider, language, guest_voice)
-        
-        # Fallback to random if specific voices not found
-        if not host_voice_data:
-            host_voice_data = voice_manager.get_random_voice(voice_provider, language, 'random')
-        if not guest_voice_data:
-            guest_voice_data = voice_manager.get_random_voice(voice_provider, language, 'random')
-        
-        # Create voice assignments in the format expected by the audio generation
-        if voice_provider == "elevenlabs":
-            voice_assignments = {
-                "Host (Sam)": {language: [host_voice_data['id']] if host_voice_data else []},
-                "Guest": {language: [guest_voice_data['id']] if guest_voice_data else []}
-            }
-        else:  # google_tts
-            voice_assignments = {
-                "Host (Sam)": {language: [host_voice_data['id']] if host_voice_data else []},
-                "Guest": {language: [guest_voice_data['id']] if guest_voice_data else []}
-            }
-        
-        # Log voice assignments for debugging
-        logger.info(f"Voice assignments created: {voice_assignments}")
-        logger.info(f"Host voice: {host_voice_data}")
-        logger.info(f"Guest voice: {guest_voice_data}")
+        voice_plan = _plan_voices(language, voice_provider, host_voice, guest_voice, host_name)
     
     # Parse the script content to extract dialogue
     lines = script_content.split('\n')
@@ -617,24 +701,23 @@ def synthesize_audio_from_script(
     if not dialogue_items:
         raise ValueError("No dialogue found in the script. Please check the format.")
 
-    # Generate audio for each dialogue item
-    audio_segments = []
-    total_characters = 0
-
-    for item in dialogue_items:
-        logger.info(f"Generating audio for {item['speaker']}: {item['text']}")
-        total_characters += len(item['text'])
-
-        # Google TTS expects full language names (e.g., "German")
-        language_for_tts = language
-
-        # Get audio file path
-        audio_file_path = generate_podcast_audio(
-            item['text'], item['speaker'], language_for_tts, voice_assignments, voice_provider
+    # Generate audio for each dialogue item; lines are synthesized concurrently, short ones in batches
+    with TTSPipeline(voice_plan) as tts_pipeline:
+        if checkpoint is not None:
+            tts_pipeline.restore(checkpoint.segments)
+        lines = [(item['speaker'], item['text']) for item in dialogue_items]
+        tts_pipeline.submit_lines(lines)
+
+        total_characters = sum(len(item['text']) for item in dialogue_items)
+        audio_segments = _collect_audio(
+            tts_pipeline,
+            lines,
+            lambda: script_content,
+            {'language': language, 'host_name': host_name, 'guest_name': guest_name}
         )
-        # Read the audio file into an AudioSegment
-        audio_segment = AudioSegment.from_file(audio_file_path)
-        audio_segments.append(audio_segment)
+
+    # Don't encode and package a podcast nobody is waiting for
+    check_cancelled()
 
     # Concatenate all audio segments
     combined_audio = sum(audio_segments)
@@ -653,11 +736,6 @@ def synthesize_audio_from_script(
             'text': item['text']
         })
     
-    # Generate separate channels for each speaker
-    speaker_names = {'host': host_name, 'guest': guest_name}
-    # Use VTT dialogue items with proper speaker names for separate channels
-    host_channel, guest_channel = generate_separate_channels(audio_segments, vtt_dialogue_items, speaker_names)
-
     # Export the combined audio to a temporary file
     temporary_directory = GRADIO_CACHE_DIR
     os.makedirs(temporary_directory, exist_ok=True)
@@ -669,18 +747,12 @@ def synthesize_audio_from_script(
     # Export directly to the specified path
     combined_audio.export(temp_file_path, format="mp3")
     
-    # Export separate channel files
-    host_channel_path = temp_file_path.replace('.mp3', '_host.mp3')
-    guest_channel_path = temp_file_path.replace('.mp3', '_guest.mp3')
-    
-    try:
-        host_channel.export(host_channel_path, format="mp3")
-        guest_channel.export(guest_channel_path, format="mp3")
-        logger.info(f"Generated separate channel files: {host_channel_path}, {guest_channel_path}")
-    except (PermissionError, OSError) as e:
-        logger.warning(f"Failed to create separate channel files: {e}")
-        host_channel_path = None
-        guest_channel_path = None
+    # Generate and export separate channels for each speaker
+    speaker_names = {'host': host_name, 'guest': guest_name}
+    # Use VTT dialogue items with proper speaker names for separate channels
+    host_channel_path, guest_channel_path = _export_separate_channels(
+        temp_file_path, audio_segments, vtt_dialogue_items, speaker_names
+    )
 
     vtt_content = generate_vtt_content(vtt_dialogue_items, audio_segments)
     vtt_file_path = temp_file_path.replace('.mp3', '.vtt')
@@ -693,9 +765,9 @@ def synthesize_audio_from_script(
         logger.warning(f"Failed to create VTT file: {e}")
         vtt_file_path = None
 
-    # Generate H5P package if VTT file was created successfully
+    # Generate H5P package if VTT file was created successfully (and the job is not behind)
     h5p_file_path = None
-    if vtt_file_path:
+    if vtt_file_path and _has_time_for_step("h5p"):
         try:
             # Create a title for the H5P package
             h5p_title = f"Podcast - {host_name} & {guest_name}"
@@ -717,3 +789,30 @@ def synthesize_audio_from_script(
     logger.info(f"Generated {total_characters} characters of audio")
 
     return temp_file_path, transcript, vtt_file_path, h5p_file_path, host_channel_path, guest_channel_path
+
+
+@job_entry_point
+def resume_podcast(job_id: str, owner: Optional[str] = None) -> Tuple[str, str, str, str, str, str]:
+    """Finish a job of owner that failed with a checkpoint, synthesizing only the lines it is missing."""
+    checkpoint = load_checkpoint(job_id)
+    # Another user's checkpoint is reported like a missing one
+    if checkpoint is None or checkpoint.owner != owner:
+        raise ValueError("This podcast can no longer be retried. Please generate it again.")
+    
+    logger.info(f"Resuming job {job_id} with {len(checkpoint.segments)} completed lines")
+    try:
+        result = synthesize_audio_from_script(
+            checkpoint.script,
+            checkpoint.params['language'],
+            checkpoint.params['host_name'],
+            checkpoint.params['guest_name'],
+            checkpoint=checkpoint
+        )
+    except ResumableJobError as e:
+        # Superseded by the checkpoint of this attempt (which has every segment of this one)
+        if e.job_id != job_id:
+            delete_checkpoint(job_id)
+        raise
+    # Any other failure (cancelled, out of time, ...) keeps the checkpoint for another retry
+    delete_checkpoint(job_id)
+    return result
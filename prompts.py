@@ -57,6 +57,29 @@ IMPORTANT RULE: Each line of dialogue should be no more than 200 characters.
 Remember: Always reply in valid JSON format, without code blocks. Begin directly with the JSON output.
 """
 
+LEAN_SCHEMA_MODIFIER = "OUTPUT FORMAT: The output has no scratchpad field. Do your brainstorming silently and output only the guest name and the dialogue."
+
+OUTLINE_PROMPT = """
+Before writing any dialogue, plan the podcast as exactly {section_count} sections that together cover the input text from opening hook to closing summary.
+For each section give a short title and the key points it should cover. Do not write any dialogue yet.
+"""
+
+SECTION_PROMPT = """
+The podcast is planned as the following sections:
+{outline}
+
+Write ONLY the dialogue for section {section_number} of {section_count}: "{section_title}".
+Cover these key points: {key_points}
+Aim for {min_items} to {max_items} dialogue items in this section.
+{position_instructions}
+"""
+
+SECTION_POSITION_INSTRUCTIONS = {
+    "first": "This is the opening section: the host opens the podcast with a strong hook and introduces the guest. Do not wrap up the conversation.",
+    "middle": "This section continues a conversation already in progress: do not greet, introduce the guest again, or sign off.",
+    "last": "This is the closing section: continue the conversation in progress without greetings, weave in a summary of the key insights and let the host conclude the podcast.",
+}
+
 QUESTION_MODIFIER = "PLEASE ANSWER THE FOLLOWING QN:"
 
 TONE_MODIFIER = "TONE: The tone of the podcast should be"
@@ -0,0 +1,227 @@
+"""
+rate_limiter.py - Adaptive client-side rate limiting for provider calls
+
+Each (provider, API key) pair gets one AdaptiveRateLimiter, shared by every
+job in the process:
+- token buckets bound requests per second and characters per second
+- the number of requests in flight follows AIMD: it grows by about one per
+  round of successful requests and halves when the provider throttles us
+  (HTTP 429 / gRPC RESOURCE_EXHAUSTED), then all requests pause briefly
+
+Throughput therefore settles just below the provider's real limit instead of
+every line hitting 429 and retrying at the same time.
+
+When the limiter is full, waiting requests of a higher-priority job lane
+(JOB_LANES) get the next free slot. LLM calls go through the limiter of their
+provider key too, so the calls of script-only jobs go before those of
+synthesis jobs.
+
+Limiters run on the async engine loop:
+
+    async with get_rate_limiter("google_tts", api_key).slot(len(text)):
+        response = await client.synthesize_speech(...)
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from google.api_core import exceptions as google_exceptions
+from loguru import logger
+
+from constants import RATE_LIMIT_THROTTLE_COOLDOWN, RATE_LIMITS
+from jobs import current_job
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """Return True if the provider rejected the request for exceeding a rate limit."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429
+    if isinstance(error, (google_exceptions.TooManyRequests, google_exceptions.ResourceExhausted)):
+        return True
+    # google-genai API errors carry the HTTP status in .code
+    return getattr(error, "code", None) == 429
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Return the Retry-After delay in seconds sent with a throttle response, if any."""
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            return float(error.response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+class TokenBucket:
+    """Allow `rate` units per second with bursts of up to `capacity` units."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, amount: float) -> float:
+        """Return how long to wait before `amount` units are available."""
+        self._refill()
+        # A single request larger than the bucket only needs a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """Token buckets plus AIMD concurrency control for one provider key."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: Optional[float] = None,
+        characters_per_second: Optional[float] = None,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1
+    ):
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.character_bucket = TokenBucket(characters_per_second) if characters_per_second else None
+        self.concurrency = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters: List[asyncio.Future] = []
+        self._waiting: Dict[int, int] = {}  # Requests waiting for a slot, by priority
+
+    def _outranked(self, priority: int) -> bool:
+        return any(count for waiting_priority, count in self._waiting.items() if waiting_priority > priority)
+
+    async def acquire(self, characters: int = 0, priority: int = 0) -> float:
+        """Wait for a slot and for the buckets to allow the request; return its start time."""
+        # Everything here runs on the engine loop, so no lock is needed
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while self.in_flight >= int(self.concurrency) or self._outranked(priority):
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        finally:
+            self._waiting[priority] -= 1
+            # Lower-priority requests held back by this one may take a free slot now
+            if self.in_flight < int(self.concurrency):
+                self._wake_waiters()
+        self.in_flight += 1
+
+        try:
+            while True:
+                delay = self._paused_until - time.monotonic()
+                if self.request_bucket:
+                    delay = max(delay, self.request_bucket.delay(1))
+                if self.character_bucket and characters:
+                    delay = max(delay, self.character_bucket.delay(characters))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._free_slot()
+            raise
+
+        if self.request_bucket:
+            self.request_bucket.consume(1)
+        if self.character_bucket and characters:
+            self.character_bucket.consume(characters)
+        return time.monotonic()
+
+    def has_spare_capacity(self) -> bool:
+        """Return True if another request could start right now without waiting."""
+        return self.in_flight < int(self.concurrency) and time.monotonic() >= self._paused_until
+
+    def release(
+        self,
+        started_at: float,
+        succeeded: bool = True,
+        throttled: bool = False,
+        retry_after: Optional[float] = None
+    ) -> None:
+        """Free the slot and adapt the concurrency to how the request went."""
+        if throttled:
+            # Requests already in flight when we backed off report the same
+            # overload; halve once per overload, not once per failed request
+            if started_at >= self._last_decrease:
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                self._last_decrease = time.monotonic()
+                logger.warning(f"{self.name} is throttling requests, reducing concurrency to {int(self.concurrency)}")
+            cooldown = retry_after if retry_after is not None else RATE_LIMIT_THROTTLE_COOLDOWN
+            self._paused_until = max(self._paused_until, time.monotonic() + cooldown)
+        elif succeeded:
+            # Additive increase: about +1 for every `concurrency` successful requests
+            previous = int(self.concurrency)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            if int(self.concurrency) > previous:
+                logger.debug(f"{self.name} concurrency increased to {int(self.concurrency)}")
+
+        self._free_slot()
+
+    def _free_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        # Wake every waiter; each one re-checks the (possibly smaller) limit and priorities
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, characters: int = 0):
+        """Hold a rate-limited slot for the duration of one provider request."""
+        job = current_job()
+        started_at = await self.acquire(characters, job.priority if job is not None else 0)
+        try:
+            yield
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            # Other errors say nothing about the rate limit; leave the concurrency alone
+            self.release(started_at, succeeded=False, throttled=throttled,
+                         retry_after=_retry_after(e) if throttled else None)
+            raise
+        except BaseException:
+            # Cancelled: give the slot back without judging the provider
+            self._free_slot()
+            raise
+        else:
+            self.release(started_at)
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+
+
+def get_rate_limiter(provider: str, api_key: Optional[str]) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for a provider and API key.
+
+    Limits come from RATE_LIMITS[provider]. Call this from the engine loop.
+    """
+    key = (provider, api_key or "")
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(provider, **RATE_LIMITS.get(provider, {}))
+        _limiters[key] = limiter
+    return limiter
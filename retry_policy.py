@@ -0,0 +1,104 @@
+"""
+retry_policy.py - Shared retry handling for provider calls
+
+RetryPolicy retries a coroutine only when the error is transient (timeouts,
+connection errors, 408/429/5xx), waits with exponential backoff and full
+jitter, and charges every retry to the retry budget of the current job. A job
+whose provider keeps failing therefore fails fast instead of sleeping through
+several retries for every line, while a short blip recovers within a second.
+
+    policy = RetryPolicy(max_attempts=3, base_delay=0.5)
+    response = await policy.call(lambda: client.synthesize_speech(...), "Google Cloud TTS request")
+"""
+
+import asyncio
+import random
+import threading
+from typing import Any, Awaitable, Callable
+
+import httpx
+from loguru import logger
+
+from constants import RETRY_BUDGET_PER_JOB, RETRY_MAX_DELAY
+
+# HTTP status codes worth retrying: request timeout, throttling and server errors
+_RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Return True for transient provider errors, False for permanent ones."""
+    if isinstance(error, (TimeoutError, httpx.TimeoutException, httpx.TransportError, ConnectionError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in _RETRYABLE_STATUS_CODES
+    # google-api-core and google-genai errors carry the HTTP status in .code
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in _RETRYABLE_STATUS_CODES
+    # Anything else (invalid input, validation errors, local I/O) won't fix itself
+    return False
+
+
+class RetryBudget:
+    """The number of retries one job may still spend across all provider calls."""
+
+    def __init__(self, max_retries: int = RETRY_BUDGET_PER_JOB):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; return False if it is exhausted."""
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+
+class RetryPolicy:
+    """Retry transient errors with exponential backoff and full jitter."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = RETRY_MAX_DELAY,
+        retryable: Callable[[BaseException], bool] = is_retryable
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay before retry number attempt + 1 (full jitter)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, operation: Callable[[], Awaitable[Any]], description: str) -> Any:
+        """Await operation() until it succeeds, fails permanently or runs out of retries.
+
+        The last error is re-raised unchanged.
+        """
+        # jobs.py builds its JobContext from RetryBudget, so import it here
+        from jobs import current_job
+
+        for attempt in range(self.max_attempts):
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not self.retryable(e):
+                    raise
+                job = current_job()
+                if job is not None and not job.retry_budget.try_spend():
+                    logger.warning(f"{description} failed ({e}); retry budget of job {job.job_id} is exhausted")
+                    raise
+                delay = self.backoff(attempt)
+                if job is not None and not job.deadline.allows(delay):
+                    logger.warning(f"{description} failed ({e}); no time left to retry before the deadline of job {job.job_id}")
+                    raise
+                logger.warning(
+                    f"{description} failed ({e}), retrying in {delay:.2f}s "
+                    f"(attempt {attempt + 2}/{self.max_attempts})"
+                )
+                await asyncio.sleep(delay)
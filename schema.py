@@ -2,9 +2,11 @@
 schema.py - Pydantic models for structured podcast generation
 """
 
-from typing import List
+from typing import ClassVar, List, Tuple
 from pydantic import BaseModel, Field
 
+from constants import DIALOGUE_SCHEMA_MODE
+
 
 class DialogueItem(BaseModel):
     """A single dialogue item with speaker and text."""
@@ -22,6 +24,10 @@ class DialogueItem(BaseModel):
 class ShortDialogue(BaseModel):
     """The dialogue between the host and guest for short-form content."""
 
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "short"
+    item_target: ClassVar[Tuple[int, int]] = (11, 17)
+
     scratchpad: str = Field(
         ..., 
         description="Your thinking process and planning for the dialogue"
@@ -39,6 +45,10 @@ class ShortDialogue(BaseModel):
 class MediumDialogue(BaseModel):
     """The dialogue between the host and guest for medium-form content."""
 
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "medium"
+    item_target: ClassVar[Tuple[int, int]] = (19, 29)
+
     scratchpad: str = Field(
         ..., 
         description="Your thinking process and planning for the dialogue"
@@ -56,6 +66,10 @@ class MediumDialogue(BaseModel):
 class LongDialogue(BaseModel):
     """The dialogue between the host and guest for long-form content."""
 
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "long"
+    item_target: ClassVar[Tuple[int, int]] = (70, 100)
+
     scratchpad: str = Field(
         ..., 
         description="Your thinking process and planning for the dialogue"
@@ -70,9 +84,104 @@ class LongDialogue(BaseModel):
     )
 
 
+class LeanShortDialogue(BaseModel):
+    """Short-form dialogue without the scratchpad, to save output tokens."""
+
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "short"
+    item_target: ClassVar[Tuple[int, int]] = (11, 17)
+
+    name_of_guest: str = Field(
+        ..., 
+        description="The name of the guest speaker"
+    )
+    dialogue: List[DialogueItem] = Field(
+        ..., 
+        description="A list of dialogue items, typically between 11 to 17 items"
+    )
+
+
+class LeanMediumDialogue(BaseModel):
+    """Medium-form dialogue without the scratchpad, to save output tokens."""
+
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "medium"
+    item_target: ClassVar[Tuple[int, int]] = (19, 29)
+
+    name_of_guest: str = Field(
+        ..., 
+        description="The name of the guest speaker"
+    )
+    dialogue: List[DialogueItem] = Field(
+        ..., 
+        description="A list of dialogue items, typically between 19 to 29 items"
+    )
+
+
+class LeanLongDialogue(BaseModel):
+    """Long-form dialogue without the scratchpad, to save output tokens."""
+
+    # Length key and target number of dialogue items, used by the LLM and repair steps
+    length_key: ClassVar[str] = "long"
+    item_target: ClassVar[Tuple[int, int]] = (70, 100)
+
+    name_of_guest: str = Field(
+        ..., 
+        description="The name of the guest speaker"
+    )
+    dialogue: List[DialogueItem] = Field(
+        ..., 
+        description="A list of dialogue items, typically between 70 to 100 items for comprehensive coverage"
+    )
+
+
+class OutlineSection(BaseModel):
+    """One section of a long-form podcast outline."""
+
+    title: str = Field(
+        ...,
+        description="A short title for this part of the conversation"
+    )
+    key_points: List[str] = Field(
+        ...,
+        description="The points from the input text this section should cover"
+    )
+
+
+class PodcastOutline(BaseModel):
+    """The section plan for a long-form podcast, generated before the dialogue."""
+
+    sections: List[OutlineSection] = Field(
+        ...,
+        description="The sections of the podcast in the order they are discussed"
+    )
+
+
+class DialogueSection(BaseModel):
+    """The dialogue for a single section of a long-form podcast."""
+
+    dialogue: List[DialogueItem] = Field(
+        ...,
+        description="A list of dialogue items for this section only"
+    )
+
+
+def is_lean_schema(schema) -> bool:
+    """Check whether a dialogue schema omits the scratchpad field."""
+    return "scratchpad" not in schema.model_fields
+
+
 # Schema selection function
-def get_dialogue_schema(length: str):
-    """Get the appropriate dialogue schema based on length."""
+def get_dialogue_schema(length: str, mode: str = DIALOGUE_SCHEMA_MODE):
+    """Get the appropriate dialogue schema based on length and schema mode ("full" or "lean")."""
+    if mode == "lean":
+        schemas = {
+            "short": LeanShortDialogue,
+            "medium": LeanMediumDialogue,
+            "long": LeanLongDialogue
+        }
+        return schemas.get(length, LeanMediumDialogue)
+
     schemas = {
         "short": ShortDialogue,
         "medium": MediumDialogue,
@@ -0,0 +1,187 @@
+"""
+tts_batching.py - Fewer TTS requests for short dialogue lines
+
+Every TTS request pays a fixed round-trip latency, however short the text, and
+a podcast has many lines of a few words ("Exactly!", "Right, so..."). Lines in
+the same voice do not have to be synthesized separately:
+- plan_tts_requests() groups short lines of one speaker, and consecutive lines
+  of the same speaker, into batches of a bounded size
+- a batch is synthesized as one text, with TTS_BATCH_SEPARATOR between lines
+- split_batch_audio() cuts the audio back into one segment per line at the
+  pauses between them, so VTT cues and speaker channels keep per-line timing
+
+The Chirp HD voices only take plain text (no SSML marks, so no timepoints),
+which is why the lines are located by silence detection.
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+
+from constants import (
+    TTS_BATCH_DURATION_SLACK_MS,
+    TTS_BATCH_MAX_CHARS,
+    TTS_BATCH_MAX_DURATION_RATIO,
+    TTS_BATCH_MAX_LINES,
+    TTS_BATCH_MIN_SILENCE_MS,
+    TTS_BATCH_SHORT_LINE_CHARS,
+    TTS_BATCH_SILENCE_THRESH_DB,
+)
+
+# A (speaker, text) dialogue line
+Line = Tuple[str, str]
+
+# How much a longer pause outweighs its distance from the expected boundary
+# (ms of distance per ms of pause); the separator pause is longer than the
+# pauses inside a sentence
+_PAUSE_WEIGHT = 4
+# Step of the silence scan in ms; finer steps cost time without better cuts
+_SEEK_STEP_MS = 10
+
+
+def is_short_line(text: str, short_chars: int = TTS_BATCH_SHORT_LINE_CHARS) -> bool:
+    """Return True for lines that are batched with other lines of their speaker."""
+    return len(text) <= short_chars
+
+
+def plan_tts_requests(
+    lines: List[Line],
+    role_of: Callable[[str], str],
+    short_chars: int = TTS_BATCH_SHORT_LINE_CHARS,
+    max_chars: int = TTS_BATCH_MAX_CHARS,
+    max_lines: int = TTS_BATCH_MAX_LINES
+) -> List[List[Line]]:
+    """
+    Group dialogue lines into TTS requests.
+
+    A line joins the open batch of its speaker's role if the batch has room and
+    the line is short or directly follows the batch's last line. Batches are
+    returned in the order of their first line, so early lines are requested first.
+
+    Args:
+        lines: Dialogue lines in script order, without duplicates
+        role_of: Maps a speaker label to its voice role (e.g. VoicePlan.role)
+        short_chars: Lines up to this length may join non-adjacent lines
+        max_chars: Maximum text length of one batch
+        max_lines: Maximum number of lines in one batch
+
+    Returns:
+        List of batches, each a list of lines
+    """
+    batches: List[List[Line]] = []
+    open_batches = {}
+    previous: Optional[List[Line]] = None
+
+    for speaker, text in lines:
+        role = role_of(speaker)
+        batch = open_batches.get(role)
+        joins = (
+            batch is not None
+            and len(batch) < max_lines
+            and sum(len(t) for _, t in batch) + len(text) <= max_chars
+            and (is_short_line(text, short_chars) or batch is previous)
+        )
+        if not joins:
+            batch = []
+            batches.append(batch)
+            open_batches[role] = batch
+        batch.append((speaker, text))
+        previous = batch
+
+    return batches
+
+
+def split_batch_audio(
+    audio: AudioSegment,
+    texts: List[str],
+    min_silence_ms: int = TTS_BATCH_MIN_SILENCE_MS,
+    silence_thresh_db: float = TTS_BATCH_SILENCE_THRESH_DB
+) -> Optional[List[AudioSegment]]:
+    """
+    Cut the audio of a batch back into one segment per line.
+
+    Each boundary is placed in the middle of a pause. The pauses are chosen
+    together, favouring long pauses close to where the boundaries are expected
+    from the text lengths.
+
+    Args:
+        audio: Audio of the batch
+        texts: Texts of the batched lines, in order
+        min_silence_ms: Shortest pause that can separate two lines
+        silence_thresh_db: How far below the average level a pause is
+
+    Returns:
+        One AudioSegment per text, or None if the audio has too few pauses or
+        the best cuts give a line an implausible duration for its text
+    """
+    if len(texts) == 1:
+        return [audio]
+    if audio.dBFS == float("-inf"):
+        return None
+
+    duration = len(audio)
+    silences = [
+        (start, end)
+        for start, end in detect_silence(
+            audio,
+            min_silence_len=min_silence_ms,
+            silence_thresh=audio.dBFS - silence_thresh_db,
+            seek_step=_SEEK_STEP_MS,
+        )
+        # Leading and trailing silence does not separate lines
+        if start > 0 and end < duration
+    ]
+    if len(silences) < len(texts) - 1:
+        return None
+
+    # Where each boundary is expected if speech rate were even across lines
+    total_chars = sum(len(text) for text in texts)
+    expected = []
+    consumed = 0
+    for text in texts[:-1]:
+        consumed += len(text)
+        expected.append(duration * consumed / total_chars)
+
+    def cost(boundary: int, silence: int) -> float:
+        start, end = silences[silence]
+        return abs((start + end) / 2 - expected[boundary]) - _PAUSE_WEIGHT * (end - start)
+
+    # Choose the ordered set of pauses with the lowest total cost:
+    # best[b][s] is the cost of boundaries 0..b with boundary b at pause s
+    boundaries = len(expected)
+    best = [[float("inf")] * len(silences) for _ in range(boundaries)]
+    choice = [[0] * len(silences) for _ in range(boundaries)]
+    for s in range(len(silences)):
+        best[0][s] = cost(0, s)
+    for b in range(1, boundaries):
+        lowest, lowest_at = float("inf"), 0
+        for s in range(b, len(silences)):
+            if best[b - 1][s - 1] < lowest:
+                lowest, lowest_at = best[b - 1][s - 1], s - 1
+            best[b][s] = lowest + cost(b, s)
+            choice[b][s] = lowest_at
+
+    silence = min(range(len(silences)), key=lambda s: best[-1][s])
+    cuts = []
+    for b in range(boundaries - 1, -1, -1):
+        start, end = silences[silence]
+        cuts.append((start + end) // 2)
+        silence = choice[b][silence]
+    cuts.reverse()
+
+    bounds = [0] + cuts + [duration]
+
+    # A cut in the wrong pause would put speech under the wrong line; only
+    # accept splits whose line durations roughly follow the text lengths
+    for i, text in enumerate(texts):
+        actual = bounds[i + 1] - bounds[i]
+        share = duration * len(text) / total_chars
+        low = share / TTS_BATCH_MAX_DURATION_RATIO - TTS_BATCH_DURATION_SLACK_MS
+        high = share * TTS_BATCH_MAX_DURATION_RATIO + TTS_BATCH_DURATION_SLACK_MS
+        if not low <= actual <= high:
+            logger.debug(f"Rejecting batch split: line {i + 1} got {actual}ms for an expected {share:.0f}ms")
+            return None
+
+    return [audio[bounds[i]:bounds[i + 1]] for i in range(len(texts))]
@@ -0,0 +1,153 @@
+"""
+tts_chunking.py - Sentence-level chunks of long dialogue lines
+
+A long monologue line can exceed the provider's input limit (5,000 bytes for
+Google Cloud TTS) and, even within it, is the slowest request of the job. Long
+lines are split at sentence boundaries into chunks that are synthesized
+concurrently and joined back into one segment:
+
+    chunks = split_line(text, max_bytes=5000)
+    audio = stitch_chunks([synthesize(chunk) for chunk in chunks])
+
+A sentence that alone exceeds the limit is split further at clauses, then words.
+"""
+
+import re
+from typing import List, Tuple
+
+from pydub import AudioSegment
+
+from constants import TTS_CHUNK_PAUSE_MS, TTS_CHUNK_TARGET_CHARS
+
+# Whitespace after the end of a sentence: terminal punctuation, optionally
+# followed by a closing quote or bracket. CJK text has no space between
+# sentences, so after 。！？ the boundary may be empty
+_SENTENCE_END = re.compile(
+    r'(?:(?<=[.!?…])|(?<=[.!?…]["\')\]]))\s+'
+    r'|(?:(?<=[。！？])|(?<=[。！？][」』）"\')\]]))(?![」』）"\')\]])\s*'
+)
+# Places to split a sentence that is too long on its own
+_CLAUSE_END = re.compile(r'(?<=[,;:–—])\s+|(?<=[，、；：])\s*')
+
+
+# A piece of a line and the separator that followed it in the line ("" after
+# a CJK sentence), so pieces are joined back exactly as they were written
+Piece = Tuple[str, str]
+
+
+def _byte_length(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _split(pattern: "re.Pattern", text: str) -> List[Piece]:
+    """Split text at the matches of pattern, keeping each match as the separator."""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        pieces.append((text[start:match.start()], match.group()))
+        start = match.end()
+    pieces.append((text[start:], ""))
+    return [piece for piece in pieces if piece[0]]
+
+
+def _join(pieces: List[Piece]) -> str:
+    """Join pieces with their original separators."""
+    return "".join(text + separator for text, separator in pieces[:-1]) + pieces[-1][0]
+
+
+def _split_oversized(piece: Piece, max_bytes: int) -> List[Piece]:
+    """Split a sentence longer than max_bytes at clauses, falling back to words."""
+    text, separator = piece
+    pieces = []
+    for pattern in (_CLAUSE_END, re.compile(r'\s+')):
+        pieces = _pack(_split(pattern, text), max_bytes, max_bytes)
+        if all(_byte_length(chunk) <= max_bytes for chunk, _ in pieces):
+            break
+    else:
+        # A single "word" over the limit (e.g. a URL or unspaced CJK text); cut it
+        # between characters, so no multi-byte character is split or lost
+        cut = []
+        for chunk, chunk_separator in pieces:
+            current = ""
+            for character in chunk:
+                if current and _byte_length(current + character) > max_bytes:
+                    cut.append((current, ""))
+                    current = ""
+                current += character
+            cut.append((current, chunk_separator))
+        pieces = cut
+    # The last piece is followed by what followed the whole sentence
+    pieces[-1] = (pieces[-1][0], separator)
+    return pieces
+
+
+def _pack(parts: List[Piece], target_chars: int, max_bytes: int) -> List[Piece]:
+    """Join consecutive parts into chunks of up to target_chars (and max_bytes)."""
+    chunks = []
+    current = []
+    for part in parts:
+        candidate = _join(current + [part])
+        if current and (len(candidate) > target_chars or _byte_length(candidate) > max_bytes):
+            chunks.append((_join(current), current[-1][1]))
+            current = []
+        current.append(part)
+    if current:
+        chunks.append((_join(current), current[-1][1]))
+    return chunks
+
+
+def split_line(text: str, max_bytes: int, target_chars: int = TTS_CHUNK_TARGET_CHARS) -> List[str]:
+    """
+    Split a line into chunks of whole sentences for separate TTS requests.
+
+    Lines up to target_chars (and max_bytes) are returned unchanged. Longer
+    lines are split into chunks of roughly equal length, so the concurrent
+    requests finish at about the same time.
+
+    Args:
+        text: Text of the line
+        max_bytes: Input limit of the provider in UTF-8 bytes
+        target_chars: Preferred maximum chunk length
+
+    Returns:
+        List of chunk texts, in order
+    """
+    text = text.strip()
+    if len(text) <= target_chars and _byte_length(text) <= max_bytes:
+        return [text]
+
+    sentences = []
+    for sentence in _split(_SENTENCE_END, text):
+        if _byte_length(sentence[0]) > max_bytes:
+            sentences.extend(_split_oversized(sentence, max_bytes))
+        else:
+            sentences.append(sentence)
+
+    # The chunk count greedy packing needs, then the same number of chunks cut
+    # at the sentence boundaries nearest to even shares of the text, so no
+    # short remainder is left over
+    chunk_count = len(_pack(sentences, target_chars, max_bytes))
+    total_chars = sum(len(sentence) + len(separator) for sentence, separator in sentences)
+    chunks = []
+    current = []
+    consumed = 0
+    for sentence in sentences:
+        length = len(sentence[0]) + len(sentence[1])
+        boundary = total_chars * (len(chunks) + 1) / chunk_count
+        closer_before = (consumed + length) - boundary > boundary - consumed
+        too_big = _byte_length(_join(current + [sentence])) > max_bytes
+        if current and (closer_before or too_big):
+            chunks.append(_join(current))
+            current = []
+        current.append(sentence)
+        consumed += length
+    chunks.append(_join(current))
+    return chunks
+
+
+def stitch_chunks(segments: List[AudioSegment], pause_ms: int = TTS_CHUNK_PAUSE_MS) -> AudioSegment:
+    """Join the audio of a line's chunks with a short sentence pause."""
+    audio = segments[0]
+    for segment in segments[1:]:
+        audio += AudioSegment.silent(duration=pause_ms, frame_rate=audio.frame_rate) + segment
+    return audio
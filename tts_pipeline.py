@@ -0,0 +1,293 @@
+"""
+tts_pipeline.py - Background text-to-speech stage for podcast generation
+
+TTSPipeline accepts dialogue lines as soon as they are known (for example while
+the LLM is still streaming the rest of the script) and synthesizes them as
+coroutines on the shared async engine. Lines are keyed by (speaker, text), so
+submitting the same line twice reuses the audio that is already synthesized or
+in flight. Voices come from the job's immutable VoicePlan, so any number of lines
+can be synthesized at once.
+
+Lines can also be submitted speculatively, e.g. first-draft lines while the
+refinement call is still rewriting the script. Speculative audio is reused for
+every final line whose (speaker, text) did not change; the rest is discarded.
+
+The final lines of a script are submitted together with submit_lines(), which
+batches short lines into fewer provider requests (tts_batching.py). Long lines
+are synthesized as concurrent sentence chunks (tts_chunking.py).
+
+results() waits for every line instead of failing on the first error: lines
+that failed are retried once more, with failover to the other provider, and
+only if some still fail does it raise LineSynthesisError, which carries the
+completed segments so the job can keep them (job_checkpoint.py). Segments
+restored from such a checkpoint are never synthesized again.
+
+Lines are cancelled with the job (see jobs.py); the audio files of a cancelled
+job are removed when the pipeline is closed.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from pydub import AudioSegment
+
+from async_engine import engine
+from jobs import check_cancelled, current_job
+from constants import (
+    TTS_BATCH_SEPARATOR,
+    TTS_BATCHING_ENABLED,
+    TTS_CHUNKING_ENABLED,
+    TTS_PIPELINE_CONCURRENCY,
+)
+from tts_batching import is_short_line, plan_tts_requests, split_batch_audio
+from tts_chunking import split_line, stitch_chunks
+from utils import agenerate_podcast_audio, get_tts_provider
+from voice_plan import VoicePlan
+
+
+class LineSynthesisError(Exception):
+    """Some lines could not be synthesized; segments holds the audio of the others."""
+
+    def __init__(self, failed: List[Tuple[str, str]], segments: Dict[Tuple[str, str], AudioSegment], total: int):
+        super().__init__(f"{len(failed)} of {total} lines could not be synthesized")
+        self.failed = failed
+        self.segments = segments
+
+
+class TTSPipeline:
+    """Synthesize dialogue lines in the background while the job continues."""
+
+    def __init__(
+        self,
+        voice_plan: VoicePlan,
+        max_concurrency: int = TTS_PIPELINE_CONCURRENCY,
+        batching: bool = TTS_BATCHING_ENABLED,
+        chunking: bool = TTS_CHUNKING_ENABLED
+    ):
+        self.voice_plan = voice_plan
+        self.max_concurrency = max_concurrency
+        self.batching = batching
+        self.chunking = chunking
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._futures: Dict[Tuple[str, str], Future] = {}
+        self._batches: List[Future] = []
+        self._speculative: Set[Tuple[str, str]] = set()
+        self._requested: Set[Tuple[str, str]] = set()
+        self._restored: Dict[Tuple[str, str], AudioSegment] = {}
+        self._files: List[str] = []
+        self._job = current_job()
+        self._lock = threading.Lock()
+
+    def submit(self, speaker: str, text: str, speculative: bool = False) -> Future:
+        """Queue a line for synthesis and return the future for its AudioSegment."""
+        key = (speaker, text)
+        with self._lock:
+            if speculative:
+                self._speculative.add(key)
+            else:
+                self._requested.add(key)
+            future = self._futures.get(key) or self._restored_future(key)
+            if future is None:
+                logger.info(f"Queueing {'speculative ' if speculative else ''}audio for {speaker}: {text[:50]}...")
+                future = engine.submit(self._synthesize(speaker, text))
+                self._futures[key] = future
+            return future
+
+    def submit_lines(self, lines: List[Tuple[str, str]]) -> None:
+        """Queue the final (speaker, text) lines, batching those not already in flight."""
+        with self._lock:
+            pending = []
+            for key in lines:
+                self._requested.add(key)
+                if key not in self._futures and self._restored_future(key) is None and key not in pending:
+                    pending.append(key)
+
+            if self.batching:
+                batches = plan_tts_requests(pending, self.voice_plan.role)
+            else:
+                batches = [[key] for key in pending]
+
+            for batch in batches:
+                if len(batch) == 1:
+                    self._futures[batch[0]] = engine.submit(self._synthesize(*batch[0]))
+                    continue
+                batch_future = engine.submit(self._synthesize_batch(batch))
+                self._batches.append(batch_future)
+                for index, key in enumerate(batch):
+                    self._futures[key] = engine.submit(self._batch_line(batch_future, index))
+
+        if pending:
+            logger.info(f"Queueing {len(pending)} lines as {len(batches)} TTS requests")
+
+    def restore(self, segments: Dict[Tuple[str, str], AudioSegment]) -> None:
+        """Reuse audio of an earlier attempt of the job, keyed by (role, text)."""
+        with self._lock:
+            self._restored.update(segments)
+
+    def _restored_future(self, key: Tuple[str, str]) -> Optional[Future]:
+        """Return a finished future for a line with restored audio (call with the lock held)."""
+        speaker, text = key
+        segment = self._restored.get((self.voice_plan.role(speaker), text))
+        if segment is None:
+            return None
+        future = Future()
+        future.set_result(segment)
+        self._futures[key] = future
+        return future
+
+    def defers(self, text: str) -> bool:
+        """Return True if a line is better left for submit_lines() to batch than sent now."""
+        return self.batching and is_short_line(text)
+
+    def discard_speculation(self) -> dict:
+        """Cancel speculative lines the final script did not use and report the hit rate.
+
+        Call this once every final line has been submitted.
+        """
+        with self._lock:
+            unused = self._speculative - self._requested
+            cancelled = sum(1 for key in unused if self._futures[key].cancel())
+            hits = len(self._requested & self._speculative)
+            stats = {
+                'final_lines': len(self._requested),
+                'speculative_lines': len(self._speculative),
+                'reused': hits,
+                'wasted': len(unused) - cancelled,
+                'cancelled': cancelled,
+                'hit_rate': hits / len(self._requested) if self._requested else 0.0,
+            }
+
+        if stats['speculative_lines']:
+            logger.info(
+                f"Speculative synthesis: reused {stats['reused']}/{stats['final_lines']} final lines "
+                f"(hit rate {stats['hit_rate']:.0%}), {stats['wasted']} wasted, {stats['cancelled']} cancelled"
+            )
+        return stats
+
+    def result(self, speaker: str, text: str) -> AudioSegment:
+        """Return the audio for a line, synthesizing it now if it was never queued."""
+        return self.submit(speaker, text).result()
+
+    def results(self, lines: List[Tuple[str, str]]) -> List[AudioSegment]:
+        """
+        Return the audio of each line, in order, once every line has finished.
+
+        A line that failed does not stop the others. Failed lines are retried
+        once more, one request per line and with failover to the other
+        provider, after the rest of the job.
+
+        Args:
+            lines: (speaker, text) lines, as submitted
+
+        Returns:
+            One AudioSegment per line
+
+        Raises:
+            LineSynthesisError: Some lines still failed; it holds the completed segments
+        """
+        segments: Dict[Tuple[str, str], AudioSegment] = {}
+        failed = []
+        for key in dict.fromkeys(lines):
+            try:
+                segments[key] = self.submit(*key).result()
+            except CancelledError:
+                check_cancelled()
+                raise
+            except Exception as e:
+                logger.warning(f"Audio for {key[0]} failed ({key[1][:50]}...): {e}")
+                failed.append(key)
+
+        if failed:
+            logger.warning(f"Retrying {len(failed)} failed lines")
+            retries = {key: engine.submit(self._synthesize(*key, failover=True)) for key in failed}
+            with self._lock:
+                self._futures.update(retries)
+            failed = []
+            for key, future in retries.items():
+                try:
+                    segments[key] = future.result()
+                except CancelledError:
+                    check_cancelled()
+                    raise
+                except Exception as e:
+                    logger.error(f"Audio for {key[0]} failed again ({key[1][:50]}...): {e}")
+                    failed.append(key)
+
+        if failed:
+            raise LineSynthesisError(failed, segments, len(segments) + len(failed))
+        return [segments[key] for key in lines]
+
+    def _concurrency(self) -> asyncio.Semaphore:
+        """Return the semaphore that bounds this job's in-flight requests."""
+        # Created on the engine loop, which is the only place it is used
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _synthesize(self, speaker: str, text: str, failover: bool = False) -> AudioSegment:
+        """Synthesize a single line, in concurrent sentence chunks if it is long."""
+        if self.chunking:
+            chunks = split_line(text, get_tts_provider(self.voice_plan.provider).max_input_bytes)
+        else:
+            chunks = [text]
+        if len(chunks) == 1:
+            return await self._synthesize_text(speaker, text, failover)
+
+        logger.info(f"Generating audio for a long line of {speaker} in {len(chunks)} chunks")
+        segments = await asyncio.gather(*(self._synthesize_text(speaker, chunk, failover) for chunk in chunks))
+        return await asyncio.to_thread(stitch_chunks, segments)
+
+    async def _synthesize_text(self, speaker: str, text: str, failover: bool = False) -> AudioSegment:
+        """Synthesize text in one request and load it as an AudioSegment."""
+        async with self._concurrency():
+            logger.info(f"Generating audio for {speaker}: {text}")
+            audio_file_path = await agenerate_podcast_audio(text, speaker, self.voice_plan, failover=failover)
+        self._files.append(audio_file_path)
+        # Decoding runs ffmpeg, so keep it off the event loop
+        return await asyncio.to_thread(AudioSegment.from_file, audio_file_path)
+
+    async def _synthesize_batch(self, batch: List[Tuple[str, str]]) -> List[AudioSegment]:
+        """Synthesize lines of one voice in a single request and split the audio per line."""
+        speaker = batch[0][0]
+        texts = [text for _, text in batch]
+        async with self._concurrency():
+            logger.info(f"Generating audio for {len(batch)} lines of {speaker} in one request")
+            audio_file_path = await agenerate_podcast_audio(
+                TTS_BATCH_SEPARATOR.join(texts), speaker, self.voice_plan
+            )
+        self._files.append(audio_file_path)
+        audio = await asyncio.to_thread(AudioSegment.from_file, audio_file_path)
+        segments = await asyncio.to_thread(split_batch_audio, audio, texts)
+        if segments is None:
+            logger.warning(f"Could not split batched audio into {len(batch)} lines, synthesizing them one by one")
+            segments = await asyncio.gather(*(self._synthesize(speaker, text) for speaker, text in batch))
+        return segments
+
+    async def _batch_line(self, batch_future: Future, index: int) -> AudioSegment:
+        """Return one line's audio from its batch."""
+        # Shielded: one line being cancelled must not cancel the others' request
+        segments = await asyncio.shield(asyncio.wrap_future(batch_future))
+        return segments[index]
+
+    def close(self, remove_files: bool = False):
+        """Cancel every line that has not finished yet; a cancelled job's audio files (or all, with remove_files) are removed."""
+        with self._lock:
+            for future in list(self._futures.values()) + self._batches:
+                future.cancel()
+            if remove_files or (self._job is not None and self._job.cancellation.cancelled):
+                for path in self._files:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                self._files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
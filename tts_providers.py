@@ -0,0 +1,333 @@
+"""
+tts_providers.py - Text-to-speech backends for podcast audio
+
+generate_podcast_audio talks to a TTSProvider instead of a specific API, so the
+whole synthesis pipeline (batching, chunking, rate limiting, hedging, circuit
+breaking, retries, assembly) runs the same way against every backend. A
+provider makes exactly one synthesis request; the resilience around it lives in
+utils.py and is shared.
+
+Providers are asynchronous and run on the shared async engine.
+
+Providers:
+- GoogleTTSProvider: Google Cloud Text-to-Speech over a pool of gRPC clients per API key
+- ElevenLabsProvider: ElevenLabs streaming API over the pooled HTTP client
+- LocalTTSProvider: deterministic synthetic speech with configurable latency and
+  error injection, for benchmarks and load tests without API calls
+"""
+
+import asyncio
+import hashlib
+import io
+import math
+import random
+import re
+import struct
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, List, Optional
+
+import grpc
+from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+from pydub import AudioSegment
+
+from async_engine import engine
+from client_pool import ClientPool
+from constants import (
+    ELEVENLABS_RETRY_ATTEMPTS,
+    ELEVENLABS_RETRY_BASE_DELAY,
+    ELEVENLABS_STREAM_CHUNK_BYTES,
+    GOOGLE_TTS_POOL_SIZE,
+    GOOGLE_TTS_RETRY_ATTEMPTS,
+    GOOGLE_TTS_RETRY_BASE_DELAY,
+    LOCAL_TTS_CHARS_PER_SECOND,
+    LOCAL_TTS_ERROR_RATE,
+    LOCAL_TTS_LATENCY,
+    LOCAL_TTS_LATENCY_JITTER,
+    LOCAL_TTS_LATENCY_PER_CHAR,
+    LOCAL_TTS_RETRY_ATTEMPTS,
+    LOCAL_TTS_RETRY_BASE_DELAY,
+    LOCAL_TTS_SEED,
+    LOCAL_TTS_THROTTLE_RATE,
+    TTS_MAX_INPUT_BYTES,
+)
+from retry_policy import RetryPolicy
+
+
+class TTSProvider(ABC):
+    """Interface for text-to-speech backends."""
+
+    name = "base"  # Also names the provider's rate limiter, circuit breaker and voices/ directory
+    display_name = "TTS"
+    output_format = "mp3"  # Format of the audio synthesize() returns
+    file_prefix = "tts_audio"
+    not_configured_message = "TTS provider is not configured."
+    # KeyPool the caller leases request keys from, if the provider has one
+    key_pool = None
+    retry_policy = RetryPolicy()
+
+    @property
+    def max_input_bytes(self) -> int:
+        """Return the largest text (in UTF-8 bytes) one request may carry."""
+        return TTS_MAX_INPUT_BYTES.get(self.name, 5000)
+
+    def is_configured(self) -> bool:
+        """Return True if the provider has the credentials it needs."""
+        return True
+
+    def check_configured(self) -> None:
+        """Raise ValueError if the provider cannot be used."""
+        if not self.is_configured():
+            raise ValueError(self.not_configured_message)
+
+    @abstractmethod
+    async def synthesize(self, text: str, voice_id: str, api_key: Optional[str] = None) -> bytes:
+        """Make one synthesis request and return the encoded audio."""
+
+    async def synthesize_to_file(self, text: str, voice_id: str, api_key: Optional[str], path: str) -> None:
+        """Make one synthesis request and write the encoded audio to path.
+
+        Providers with a streaming API override this to write the audio as it arrives.
+        """
+        audio_content = await self.synthesize(text, voice_id, api_key)
+        with open(path, 'wb') as audio_file:
+            audio_file.write(audio_content)
+
+    def list_voices(self, language: str) -> List[Dict]:
+        """Return the voices of a language as dicts with 'id', 'name' and 'gender'."""
+        from voice_manager import voice_manager
+        return voice_manager.load_voices(self.name, language)
+
+
+class GoogleTTSProvider(TTSProvider):
+    """Google Cloud Text-to-Speech with Chirp HD voices."""
+
+    name = "google_tts"
+    display_name = "Google Cloud TTS"
+    file_prefix = "tts_audio"
+    not_configured_message = (
+        "Google Cloud TTS client not initialized. Please set GOOGLE_CLOUD_API_KEY environment variable."
+    )
+
+    def __init__(self, key_pool):
+        self.key_pool = key_pool
+        self.retry_policy = RetryPolicy(GOOGLE_TTS_RETRY_ATTEMPTS, GOOGLE_TTS_RETRY_BASE_DELAY)
+
+    def is_configured(self) -> bool:
+        return len(self.key_pool) > 0
+
+    def clients(self, api_key: str) -> ClientPool:
+        """Return the pool of async clients for an API key on the engine loop."""
+        index = self.key_pool.keys.index(api_key)
+        return engine.resource(f"google_tts_pool_{index}", lambda: ClientPool(
+            f"google_tts key #{index + 1}",
+            lambda: _create_google_tts_client(api_key),
+            GOOGLE_TTS_POOL_SIZE,
+            is_healthy=_channel_is_healthy,
+            wait_ready=lambda client: client.transport.grpc_channel.channel_ready(),
+            close=lambda client: client.transport.close(),
+        ))
+
+    async def synthesize(self, text: str, voice_id: str, api_key: Optional[str] = None) -> bytes:
+        # Extract language code from voice name (e.g., "en-US" from "en-US-Chirp-HD-F")
+        language_code = '-'.join(voice_id.split('-')[:2])
+        with self.clients(api_key).lease() as client:
+            response = await client.synthesize_speech(
+                # Plain text only for Chirp HD voices
+                input=texttospeech.SynthesisInput(text=text),
+                voice=texttospeech.VoiceSelectionParams(language_code=language_code, name=voice_id),
+                # Chirp HD voices don't support A-Law encoding
+                audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3),
+                timeout=60
+            )
+        return response.audio_content
+
+    async def fetch_voices(self, language_code: Optional[str] = None) -> List[texttospeech.Voice]:
+        """Return the voices the API offers, optionally for one language code (e.g. "en-US")."""
+        with self.key_pool.lease() as api_key:
+            with self.clients(api_key).lease() as client:
+                response = await client.list_voices(language_code=language_code, timeout=60)
+        return list(response.voices)
+
+
+def _create_google_tts_client(api_key: str) -> texttospeech.TextToSpeechAsyncClient:
+    """Create an async Google Cloud TTS client with its own gRPC connection."""
+    def transport(**kwargs) -> TextToSpeechGrpcAsyncIOTransport:
+        def channel(host: str, **channel_kwargs) -> grpc.aio.Channel:
+            # Channels with equal arguments share connections through gRPC's
+            # global subchannel pool; a local pool gives each client its own
+            options = list(channel_kwargs.pop("options", None) or [])
+            options.append(("grpc.use_local_subchannel_pool", 1))
+            return TextToSpeechGrpcAsyncIOTransport.create_channel(host, options=options, **channel_kwargs)
+        return TextToSpeechGrpcAsyncIOTransport(channel=channel, **kwargs)
+
+    return texttospeech.TextToSpeechAsyncClient(client_options={"api_key": api_key}, transport=transport)
+
+
+def _channel_is_healthy(client: texttospeech.TextToSpeechAsyncClient) -> bool:
+    """Return False once the client's connection has failed or was shut down."""
+    state = client.transport.grpc_channel.get_state(try_to_connect=False)
+    return state not in (grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.SHUTDOWN)
+
+
+class ElevenLabsProvider(TTSProvider):
+    """ElevenLabs text-to-speech with the multilingual v2 model."""
+
+    name = "elevenlabs"
+    display_name = "ElevenLabs TTS"
+    file_prefix = "elevenlabs_audio"
+    not_configured_message = "ElevenLabs API key not initialized. Please set ELEVENLABS_API_KEY environment variable."
+
+    def __init__(self, key_pool):
+        self.key_pool = key_pool
+        self.retry_policy = RetryPolicy(ELEVENLABS_RETRY_ATTEMPTS, ELEVENLABS_RETRY_BASE_DELAY)
+
+    def is_configured(self) -> bool:
+        return len(self.key_pool) > 0
+
+    async def synthesize(self, text: str, voice_id: str, api_key: Optional[str] = None) -> bytes:
+        buffer = io.BytesIO()
+        await self._stream(text, voice_id, api_key, buffer)
+        return buffer.getvalue()
+
+    async def synthesize_to_file(self, text: str, voice_id: str, api_key: Optional[str], path: str) -> None:
+        # Chunks go to disk as they arrive, so a line's audio is never held in
+        # memory whole and the file is complete with the last received byte
+        with open(path, 'wb') as audio_file:
+            await self._stream(text, voice_id, api_key, audio_file)
+
+    async def _stream(self, text: str, voice_id: str, api_key: Optional[str], sink: BinaryIO) -> None:
+        """Request speech from the streaming endpoint and write the audio to sink as it arrives."""
+        async with engine.http_client().stream(
+            "POST",
+            f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream",
+            json={
+                "text": text,
+                "model_id": "eleven_multilingual_v2",
+                "voice_settings": {
+                    "stability": 0.5,
+                    "similarity_boost": 0.5,
+                    "style": 0.0,
+                    "use_speaker_boost": True
+                }
+            },
+            headers={
+                "Accept": "audio/mpeg",
+                "Content-Type": "application/json",
+                "xi-api-key": api_key,
+            },
+            timeout=60
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(ELEVENLABS_STREAM_CHUNK_BYTES):
+                sink.write(chunk)
+
+
+class LocalTTSError(Exception):
+    """An injected failure of the local provider, reported with an HTTP-like status code."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class LocalTTSProvider(TTSProvider):
+    """Synthetic speech for benchmarks: no network, repeatable timing and audio.
+
+    The audio of a text and voice is always the same: one tone per word at a
+    pitch derived from the voice, with short gaps between words, longer pauses
+    at punctuation and paragraph breaks, and a duration that follows the text
+    length at a natural speaking rate. Each request sleeps for a base latency
+    plus a per-character latency (with jitter) and fails or is throttled at the
+    configured rates, so retries, hedging and circuit breaking can be exercised.
+    """
+
+    name = "local"
+    display_name = "Local TTS"
+    output_format = "wav"
+    file_prefix = "local_audio"
+
+    FRAME_RATE = 24000
+    # Silence after a word, by the punctuation that ends it (in ms)
+    WORD_GAP_MS = 60
+    CLAUSE_PAUSE_MS = 180
+    SENTENCE_PAUSE_MS = 400
+    PARAGRAPH_PAUSE_MS = 700
+
+    def __init__(
+        self,
+        latency: float = LOCAL_TTS_LATENCY,
+        latency_per_char: float = LOCAL_TTS_LATENCY_PER_CHAR,
+        jitter: float = LOCAL_TTS_LATENCY_JITTER,
+        error_rate: float = LOCAL_TTS_ERROR_RATE,
+        throttle_rate: float = LOCAL_TTS_THROTTLE_RATE,
+        seed: int = LOCAL_TTS_SEED,
+        chars_per_second: float = LOCAL_TTS_CHARS_PER_SECOND
+    ):
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.chars_per_second = chars_per_second
+        self.retry_policy = RetryPolicy(LOCAL_TTS_RETRY_ATTEMPTS, LOCAL_TTS_RETRY_BASE_DELAY)
+        self._random = random.Random(seed)
+        self._tones: Dict[str, bytes] = {}
+
+    def _tone(self, voice_id: str) -> bytes:
+        """Return one second of 16-bit mono PCM at the voice's pitch."""
+        tone = self._tones.get(voice_id)
+        if tone is None:
+            digest = hashlib.md5(voice_id.encode("utf-8")).digest()
+            frequency = 110 + digest[0] % 150
+            amplitude = 0.25 * 32767
+            tone = b"".join(
+                struct.pack("<h", int(amplitude * math.sin(2 * math.pi * frequency * i / self.FRAME_RATE)))
+                for i in range(self.FRAME_RATE)
+            )
+            self._tones[voice_id] = tone
+        return tone
+
+    def render(self, text: str, voice_id: str) -> AudioSegment:
+        """Return the synthetic speech for a text."""
+        tone = self._tone(voice_id)
+        bytes_per_ms = self.FRAME_RATE * 2 // 1000
+        chunks = []
+        for word, separator in re.findall(r'(\S+)(\s*)', text):
+            duration_ms = min(1000, int(1000 * len(word) / self.chars_per_second))
+            chunks.append(tone[:duration_ms * bytes_per_ms])
+            if "\n\n" in separator:
+                pause_ms = self.PARAGRAPH_PAUSE_MS
+            elif word[-1] in ".!?…":
+                pause_ms = self.SENTENCE_PAUSE_MS
+            elif word[-1] in ",;:–—":
+                pause_ms = self.CLAUSE_PAUSE_MS
+            else:
+                pause_ms = self.WORD_GAP_MS
+            chunks.append(b"\x00\x00" * (pause_ms * self.FRAME_RATE // 1000))
+        return AudioSegment(data=b"".join(chunks), sample_width=2, frame_rate=self.FRAME_RATE, channels=1)
+
+    async def synthesize(self, text: str, voice_id: str, api_key: Optional[str] = None) -> bytes:
+        latency = (self.latency + self.latency_per_char * len(text)) * (
+            1 + self._random.uniform(-self.jitter, self.jitter)
+        )
+        outcome = self._random.random()
+        await asyncio.sleep(latency)
+        if outcome < self.throttle_rate:
+            raise LocalTTSError(429, "Injected throttling (429)")
+        if outcome < self.throttle_rate + self.error_rate:
+            raise LocalTTSError(503, "Injected provider error (503)")
+
+        def encode() -> bytes:
+            buffer = io.BytesIO()
+            self.render(text, voice_id).export(buffer, format="wav")
+            return buffer.getvalue()
+
+        return await asyncio.to_thread(encode)
+
+    def list_voices(self, language: str) -> List[Dict]:
+        return [
+            {'id': f"local-{gender}-{index}", 'name': f"Local {gender.capitalize()} {index}", 'gender': gender}
+            for gender in ("female", "male")
+            for index in (1, 2)
+        ]
@@ -1,54 +1,120 @@
 """
 utils.py
 
+Provider I/O runs as coroutines on the shared async engine (async_engine.py).
+Functions prefixed with "a" are the coroutines; the plain names are sync
+facades for Flask routes and other blocking callers.
+
 Functions:
 - generate_script: Get the dialogue from the LLM.
-- call_llm: Call the LLM with the given prompt and dialogue format.
-- parse_url: Parse the given URL and return the text content.
-- generate_podcast_audio: Generate audio for podcast using Google Cloud Text-to-Speech.
-- _use_google_tts: Generate audio using Google Cloud TTS with Chirp HD voices.
+- generate_sectioned_script / agenerate_sectioned_script: Generate a long dialogue as an outline plus concurrent sections.
+- select_llm_route: Pick the model, output token limit and timeout for a job.
+- call_llm / acall_llm: Call the LLM with the given prompt and dialogue format (optionally streamed).
+- parse_url / aparse_url: Parse the given URL and return the text content.
+- generate_podcast_audio / agenerate_podcast_audio: Generate audio for one podcast line in the job's planned voice.
+- get_tts_provider: Look up the TTS provider (tts_providers.py) of a voice plan.
+- _synthesize_tts: Synthesize text with a TTS provider through its key pool, rate limiter, hedger, circuit breaker and retries.
 """
 
 # Standard library imports
+import asyncio
 import time
-from typing import Any, Union
+from concurrent.futures import CancelledError
+from contextlib import nullcontext
+from typing import Any, Callable, Optional, Union
 import glob
 
 # Third-party imports
-import requests
+import httpx
 import google.genai as genai
-from google.cloud import texttospeech
+from loguru import logger
 
 # Local imports
 from constants import (
     GEMINI_API_KEY,
+    GEMINI_API_KEYS,
     GEMINI_MODEL_ID,
     GEMINI_MAX_TOKENS,
-    GEMINI_TEMPERATURE,
-    GOOGLE_CLOUD_API_KEY,
-    GOOGLE_TTS_VOICES,
-    GOOGLE_TTS_RETRY_ATTEMPTS,
-    GOOGLE_TTS_RETRY_DELAY,
+    GEMINI_LEAN_MAX_TOKENS,
+    GEMINI_LEAN_THINKING_BUDGET,
+    GOOGLE_CLOUD_API_KEYS,
+    ELEVENLABS_API_KEYS,
+    JOB_OPTIONAL_STEP_SECONDS,
+    KEY_POOL_REQUESTS_PER_MINUTE,
     JINA_READER_URL,
     JINA_RETRY_ATTEMPTS,
-    JINA_RETRY_DELAY,
+    JINA_RETRY_BASE_DELAY,
+    LLM_RETRY_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_PROVIDER,
+    LLM_ROUTES,
+    LONG_FORM_SECTION_COUNT,
+    LONG_FORM_SECTIONED_ENABLED,
     TEMP_AUDIO_DIR,
+    TTS_FAILOVER_ENABLED,
+    TTS_HEDGING_ENABLED,
 )
-from schema import ShortDialogue, MediumDialogue, LongDialogue
-
-# Initialize Google Gemini client with the new Gen AI SDK
-# Only initialize if API key is available
-gemini_client = None
-if GEMINI_API_KEY:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-
-# Initialize Google Cloud Text-to-Speech client
-# Only initialize if API key is available
-google_tts_client = None
-if GOOGLE_CLOUD_API_KEY:
-    google_tts_client = texttospeech.TextToSpeechClient(
-        client_options={"api_key": GOOGLE_CLOUD_API_KEY}
-    )
+from schema import (
+    DialogueItem, DialogueSection, PodcastOutline,
+    ShortDialogue, MediumDialogue, LongDialogue, is_lean_schema
+)
+from prompts import (
+    LEAN_SCHEMA_MODIFIER,
+    OUTLINE_PROMPT,
+    SECTION_POSITION_INSTRUCTIONS,
+    SECTION_PROMPT,
+)
+from dialogue_stream import DialogueStreamParser
+from dialogue_repair import repair_dialogue, repair_dialogue_item
+from llm_cache import GeminiContextCacheBackend, LocalContextCacheBackend, SourceContextCache
+from llm_providers import LLMRequest, create_llm_provider
+from async_engine import engine
+from rate_limiter import get_rate_limiter
+from hedging import get_hedger
+from circuit_breaker import get_circuit_breaker
+from retry_policy import RetryPolicy, is_retryable
+from key_pool import KeyPool
+from deadline import DeadlineExceeded
+from jobs import JobCancelled, has_time_for, stage_timeout
+from voice_plan import HOST, VoicePlan
+from tts_providers import ElevenLabsProvider, GoogleTTSProvider, LocalTTSProvider, TTSProvider
+
+# Initialize Google Gemini clients with the new Gen AI SDK, one per API key
+# Only initialize if API keys are available
+gemini_clients = {key: genai.Client(api_key=key) for key in GEMINI_API_KEYS}
+gemini_client = gemini_clients.get(GEMINI_API_KEY)
+
+# Requests are spread over every configured key of a provider
+gemini_key_pool = KeyPool("gemini", GEMINI_API_KEYS, requests_per_minute=KEY_POOL_REQUESTS_PER_MINUTE.get("gemini"))
+google_tts_key_pool = KeyPool(
+    "google_tts", GOOGLE_CLOUD_API_KEYS, requests_per_minute=KEY_POOL_REQUESTS_PER_MINUTE.get("google_tts")
+)
+elevenlabs_key_pool = KeyPool(
+    "elevenlabs", ELEVENLABS_API_KEYS, requests_per_minute=KEY_POOL_REQUESTS_PER_MINUTE.get("elevenlabs")
+)
+
+# Script generation goes through a provider so it can run against Gemini or
+# an OpenAI-compatible (e.g. self-hosted) endpoint
+llm_provider = create_llm_provider(LLM_PROVIDER, gemini_clients, gemini_key_pool)
+
+# Source documents are cached with the provider and reused across calls
+source_context_cache = SourceContextCache(
+    GeminiContextCacheBackend(gemini_clients) if gemini_clients else LocalContextCacheBackend()
+)
+
+# Speech is synthesized through a provider, selected by the job's voice plan
+tts_providers = {
+    "google_tts": GoogleTTSProvider(google_tts_key_pool),
+    "elevenlabs": ElevenLabsProvider(elevenlabs_key_pool),
+    "local": LocalTTSProvider(),
+}
+
+# Transient provider errors are retried with exponential backoff and jitter,
+# charged to the retry budget of the current job (TTS providers carry their own policy)
+_jina_retry_policy = RetryPolicy(JINA_RETRY_ATTEMPTS, JINA_RETRY_BASE_DELAY)
+
+# TTS and Jina calls are coroutines on the shared async engine; Google TTS
+# clients are created on the engine loop on first use
 
 
 def generate_script(
@@ -56,9 +122,18 @@ def generate_script(
     input_text: str,
     output_model: Union[ShortDialogue, MediumDialogue, LongDialogue],
     host_name: str = "Sam",
-    guest_name: str = "Alex"
+    guest_name: str = "Alex",
+    refine: bool = True,
+    on_draft_item: Optional[Callable[[DialogueItem], None]] = None
 ) -> Union[ShortDialogue, MediumDialogue, LongDialogue]:
-    """Get the dialogue from the LLM with structured output."""
+    """Get the dialogue from the LLM with structured output.
+
+    The draft is cleaned up locally by repair_dialogue. If refine is True a
+    second LLM call rewrites it for quality. If on_draft_item is given, the
+    first draft is streamed and each completed, repaired DialogueItem is passed
+    to it while the rest is still being generated; on_draft_item returns False
+    for a line it did not send to TTS, which repair may then still merge.
+    """
     
     # Add speaker name constraints to the system prompt
     enhanced_system_prompt = f"""{system_prompt}
@@ -74,9 +149,76 @@ CRITICAL REQUIREMENTS:
 - Ensure each dialogue item contributes meaningfully to the conversation
 """
 
-    # Call the LLM for the first time with a shorter timeout for faster response
-    print("Generating initial script draft...")
-    first_draft_dialogue = call_llm(enhanced_system_prompt, input_text, output_model, timeout=45)
+    # Pick the model tier and limits from the input size and requested length
+    route = select_llm_route(len(input_text), output_model.length_key)
+    llm_limits = {
+        "model": route["model"],
+        "max_output_tokens": route["max_output_tokens"],
+    }
+
+    # Lean schemas have no scratchpad, so bound the output and thinking tokens further
+    if is_lean_schema(output_model):
+        enhanced_system_prompt += f"\n{LEAN_SCHEMA_MODIFIER}\n"
+        llm_limits["max_output_tokens"] = min(
+            route["max_output_tokens"],
+            GEMINI_LEAN_MAX_TOKENS.get(output_model.length_key, GEMINI_MAX_TOKENS)
+        )
+        llm_limits["thinking_budget"] = GEMINI_LEAN_THINKING_BUDGET
+
+    # Streamed lines the callback already sent to TTS; repair must not merge them
+    submitted_lines = set()
+
+    def emit_draft_item(item):
+        """Repair a streamed item the same way the finished draft will be."""
+        repaired = repair_dialogue_item(item, host_name, guest_name)
+        if repaired is not None and on_draft_item(repaired) is not False:
+            submitted_lines.add((repaired.speaker, repaired.text))
+
+    first_draft_dialogue = None
+    sectioned = LONG_FORM_SECTIONED_ENABLED and output_model.length_key == "long"
+    if sectioned:
+        # Long scripts are planned first and written section by section in parallel
+        try:
+            first_draft_dialogue = generate_sectioned_script(
+                enhanced_system_prompt,
+                input_text,
+                output_model,
+                guest_name,
+                on_item=emit_draft_item if on_draft_item else None
+            )
+        except (CancelledError, JobCancelled, DeadlineExceeded):
+            # A stopped job stops here; only a failed generation falls back
+            raise
+        except Exception as e:
+            logger.warning(f"Sectioned script generation failed ({str(e)}), falling back to a single call")
+
+    if first_draft_dialogue is None:
+        # Call the LLM for the first time with a shorter timeout for faster response
+        print("Generating initial script draft...")
+        first_draft_dialogue = call_llm(
+            enhanced_system_prompt,
+            input_text,
+            output_model,
+            timeout=route["timeout"],
+            on_item=emit_draft_item if on_draft_item else None,
+            # A single call reads the source once; it only references a cache
+            # that already exists (from the sectioned calls or an earlier script
+            # of the same document)
+            cache_input=sectioned or _source_is_cached(route["model"], input_text),
+            **llm_limits
+        )
+    # Streamed lines that are already being synthesized are kept as they were emitted
+    first_draft_dialogue = repair_dialogue(
+        first_draft_dialogue, host_name, guest_name, locked=submitted_lines
+    )
+
+    if not refine:
+        return first_draft_dialogue
+
+    # Refinement is optional; a job that is behind keeps its time for synthesis
+    if not has_time_for(JOB_OPTIONAL_STEP_SECONDS["refine"], "script"):
+        logger.warning("Skipping script improvement: not enough time left for this job")
+        return first_draft_dialogue
 
     # Try to improve the dialogue with a second call, but make it optional
     # If it fails or times out, we'll use the first draft
@@ -93,80 +235,292 @@ MAINTAIN THE SAME SPEAKER NAMES: Host="{host_name}", Guest="{guest_name}"
             system_prompt_with_dialogue, 
             "Please improve the dialogue. Make it more natural and engaging. Keep the same speaker names and ensure all text fields are non-empty.", 
             output_model,
-            timeout=30  # Shorter timeout for the improvement call
+            timeout=route["timeout"],
+            **llm_limits
         )
         print("Script improvement completed successfully.")
-        return final_dialogue
+        return repair_dialogue(final_dialogue, host_name, guest_name)
         
+    except (CancelledError, JobCancelled, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"Script improvement failed ({str(e)}), using initial draft.")
+        logger.warning(f"Script improvement failed ({str(e)}), using initial draft")
         # If the second call fails, return the first draft
         return first_draft_dialogue
 
 
-def call_llm(system_prompt: str, text: str, dialogue_format: Any, timeout: int = 60) -> Any:
-    """Call the LLM with the given prompt and dialogue format."""
-    if not gemini_client:
-        raise ValueError("Gemini client not initialized. Please set GEMINI_API_KEY or GOOGLE_API_KEY environment variable.")
-    
-    # Combine system prompt and user text for Gemini
-    combined_prompt = f"{system_prompt}\n\nUser Input:\n{text}"
-    
-    import signal
-    import threading
-    
-    class TimeoutError(Exception):
-        pass
-    
-    def timeout_handler(signum, frame):
-        raise TimeoutError("LLM call timed out")
-    
-    result = None
-    exception = None
+def generate_sectioned_script(
+    system_prompt: str,
+    input_text: str,
+    output_model: Any,
+    guest_name: str,
+    on_item: Optional[Callable[[DialogueItem], None]] = None
+) -> Any:
+    """Generate a long dialogue as an outline followed by parallel section calls.
+
+    Sync facade for agenerate_sectioned_script.
+    """
+    return engine.run(agenerate_sectioned_script(
+        system_prompt, input_text, output_model, guest_name, on_item=on_item
+    ))
+
+
+async def agenerate_sectioned_script(
+    system_prompt: str,
+    input_text: str,
+    output_model: Any,
+    guest_name: str,
+    on_item: Optional[Callable[[DialogueItem], None]] = None
+) -> Any:
+    """Generate a long dialogue as an outline followed by concurrent section calls.
+
+    The first section is streamed to on_item live; later sections are passed to
+    on_item in order as soon as every section before them has finished. The
+    outline is routed like a short script and each section like a medium one.
+    """
+    section_count = LONG_FORM_SECTION_COUNT
+    outline_route = select_llm_route(len(input_text), "short")
+    section_route = select_llm_route(len(input_text), "medium")
+
+    logger.info(f"Planning {section_count} script sections")
+    outline = await acall_llm(
+        f"{system_prompt}\n{OUTLINE_PROMPT.format(section_count=section_count)}",
+        input_text,
+        PodcastOutline,
+        timeout=outline_route["timeout"],
+        model=outline_route["model"],
+        max_output_tokens=outline_route["max_output_tokens"],
+        thinking_budget=GEMINI_LEAN_THINKING_BUDGET,
+        cache_input=True
+    )
+    sections = outline.sections[:section_count]
+    if not sections:
+        raise ValueError("The outline did not contain any sections")
+
+    # Share the item target evenly between the sections
+    min_items, max_items = output_model.item_target
+    outline_text = "\n".join(
+        f"{number}. {section.title}: {'; '.join(section.key_points)}"
+        for number, section in enumerate(sections, start=1)
+    )
+
+    async def write_section(index: int) -> DialogueSection:
+        """Write the dialogue for one section of the outline."""
+        if index == 0:
+            position = "first"
+        elif index == len(sections) - 1:
+            position = "last"
+        else:
+            position = "middle"
+        section = sections[index]
+        section_prompt = SECTION_PROMPT.format(
+            outline=outline_text,
+            section_number=index + 1,
+            section_count=len(sections),
+            section_title=section.title,
+            key_points="; ".join(section.key_points),
+            min_items=max(1, min_items // len(sections)),
+            max_items=-(-max_items // len(sections)),
+            position_instructions=SECTION_POSITION_INSTRUCTIONS[position],
+        )
+        return await acall_llm(
+            f"{system_prompt}\n{section_prompt}",
+            input_text,
+            DialogueSection,
+            timeout=section_route["timeout"],
+            model=section_route["model"],
+            on_item=on_item if index == 0 else None,
+            max_output_tokens=section_route["max_output_tokens"],
+            thinking_budget=GEMINI_LEAN_THINKING_BUDGET,
+            cache_input=True
+        )
+
+    logger.info(f"Writing {len(sections)} script sections concurrently")
+    tasks = [asyncio.ensure_future(write_section(index)) for index in range(len(sections))]
+    dialogue = []
+    try:
+        # Stitch the sections together in outline order
+        for index, task in enumerate(tasks):
+            section_dialogue = (await task).dialogue
+            if on_item and index > 0:
+                for item in section_dialogue:
+                    on_item(item)
+            dialogue.extend(section_dialogue)
+    finally:
+        # One failed section fails the whole script; don't leave the rest running
+        for task in tasks:
+            task.cancel()
+
+    fields = {"name_of_guest": guest_name, "dialogue": dialogue}
+    if "scratchpad" in output_model.model_fields:
+        fields["scratchpad"] = outline_text
+    return output_model(**fields)
+
+
+def _source_is_cached(model: str, text: str) -> bool:
+    """Return True if the provider already holds a context cache of text for model."""
+    return (
+        llm_provider is not None
+        and llm_provider.supports_context_cache
+        and source_context_cache.has(llm_provider.resolve_model(model), text)
+    )
+
+
+def select_llm_route(input_chars: int, length_key: str) -> dict:
+    """Pick the first route in LLM_ROUTES that covers the input size and length."""
+    for route in LLM_ROUTES:
+        max_input_chars = route["max_input_chars"]
+        if length_key in route["lengths"] and (max_input_chars is None or input_chars <= max_input_chars):
+            logger.info(f"Routing {length_key} script for {input_chars} input characters to {route['name']} ({route['model']})")
+            return route
+    # Fall back to the last (largest) route
+    return LLM_ROUTES[-1]
+
+
+def call_llm(
+    system_prompt: str,
+    text: str,
+    dialogue_format: Any,
+    timeout: int = 60,
+    on_item: Optional[Callable[[DialogueItem], None]] = None,
+    max_output_tokens: int = GEMINI_MAX_TOKENS,
+    thinking_budget: Optional[int] = None,
+    cache_input: bool = False,
+    model: str = GEMINI_MODEL_ID
+) -> Any:
+    """Call the LLM with the given prompt and dialogue format.
+
+    Sync facade for acall_llm; on_item is called from the engine thread.
+    """
+    return engine.run(acall_llm(
+        system_prompt,
+        text,
+        dialogue_format,
+        timeout=timeout,
+        on_item=on_item,
+        max_output_tokens=max_output_tokens,
+        thinking_budget=thinking_budget,
+        cache_input=cache_input,
+        model=model
+    ))
+
+
+async def acall_llm(
+    system_prompt: str,
+    text: str,
+    dialogue_format: Any,
+    timeout: int = 60,
+    on_item: Optional[Callable[[DialogueItem], None]] = None,
+    max_output_tokens: int = GEMINI_MAX_TOKENS,
+    thinking_budget: Optional[int] = None,
+    cache_input: bool = False,
+    model: str = GEMINI_MODEL_ID
+) -> Any:
+    """Call the LLM with the given prompt and dialogue format.
+
+    If on_item is given, the response is streamed and on_item is called with
+    each DialogueItem as soon as it is complete. The fully parsed dialogue is
+    returned in both modes. Latency and token usage are logged for every call.
+
+    If cache_input is True and the provider supports it, the text is registered
+    once as a provider-side cached context and referenced instead of being sent
+    again.
+
+    The request is cancelled if it does not finish within timeout seconds, or
+    earlier if the job's time for its script runs out.
+    """
+    if not llm_provider:
+        raise ValueError(
+            "LLM provider not initialized. Please set GEMINI_API_KEY or GOOGLE_API_KEY, "
+            "or OPENAI_COMPAT_BASE_URL with LLM_PROVIDER=openai_compatible."
+        )
     
-    def make_request():
-        nonlocal result, exception
-        try:
-            # Use the new Google Gen AI SDK with structured output (correct format)
-            response = gemini_client.models.generate_content(
-                model=GEMINI_MODEL_ID,
-                contents=combined_prompt,
-                config={
-                    "temperature": GEMINI_TEMPERATURE,
-                    "max_output_tokens": GEMINI_MAX_TOKENS,
-                    "response_mime_type": "application/json",
-                    "response_schema": dialogue_format,
-                }
+    model = llm_provider.resolve_model(model)
+    timeout = stage_timeout(timeout, "script")
+    usage = None
+    items_emitted = False
+    cached_content = None
+    
+    async def make_streaming_request(request):
+        nonlocal usage, items_emitted
+        parser = DialogueStreamParser()
+        async for chunk in llm_provider.generate_stream(request):
+            # Usage is reported cumulatively, so the last chunk with it holds the totals
+            usage = chunk.usage or usage
+            for item in parser.feed(chunk.text):
+                items_emitted = True
+                on_item(item)
+        
+        return dialogue_format.model_validate_json(parser.text)
+    
+    async def make_request():
+        nonlocal usage, cached_content
+        # Every attempt leases a key, so a retry after a throttle uses another one
+        key_lease = llm_provider.key_pool.lease() if llm_provider.key_pool else nullcontext()
+        with key_lease as api_key:
+            cached_content = None
+            if cache_input and llm_provider.supports_context_cache:
+                # Cache creation is a blocking SDK call shared between threads
+                cached_content = await asyncio.to_thread(source_context_cache.get, model, text, api_key)
+            
+            request = LLMRequest(
+                model=model,
+                system_prompt=system_prompt,
+                source_text=text,
+                dialogue_format=dialogue_format,
+                max_output_tokens=max_output_tokens,
+                thinking_budget=thinking_budget,
+                cached_content=cached_content,
+                timeout=timeout,
+                api_key=api_key,
             )
             
-            # Use the parsed response directly (recommended approach)
-            if hasattr(response, 'parsed') and response.parsed is not None:
-                result = response.parsed
-            else:
-                # Fallback: Parse the response text manually if .parsed is not available
-                response_text = response.text.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:]  # Remove ```json
-                if response_text.endswith('```'):
-                    response_text = response_text[:-3]  # Remove ```
-                response_text = response_text.strip()
+            # Shared with every job's calls on this key; the job's lane sets its priority
+            async with get_rate_limiter(llm_provider.name, api_key).slot():
+                if on_item is not None:
+                    return await make_streaming_request(request)
                 
-                result = dialogue_format.model_validate_json(response_text)
-        except Exception as e:
-            exception = e
+                response = await llm_provider.generate(request)
+        usage = response.usage
+        
+        # Use the parsed response directly when the provider offers one
+        if response.parsed is not None:
+            return response.parsed
+        
+        # Fallback: Parse the response text manually
+        response_text = response.text.strip()
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]  # Remove ```json
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]  # Remove ```
+        response_text = response_text.strip()
+        
+        return dialogue_format.model_validate_json(response_text)
     
-    # Use threading for timeout handling (more reliable than signal on all platforms)
-    thread = threading.Thread(target=make_request)
-    thread.daemon = True
-    thread.start()
-    thread.join(timeout)
+    # A streamed call can only be retried before its items have been handed out
+    retry_policy = RetryPolicy(
+        LLM_RETRY_ATTEMPTS,
+        LLM_RETRY_BASE_DELAY,
+        retryable=lambda error: is_retryable(error) and not items_emitted
+    )
     
-    if thread.is_alive():
-        # Thread is still running, which means it timed out
+    start_time = time.time()
+    try:
+        result = await asyncio.wait_for(
+            retry_policy.call(make_request, f"LLM call ({dialogue_format.__name__})"), timeout
+        )
+    except asyncio.TimeoutError:
+        # When the job's time ran out, this raises DeadlineExceeded instead of
+        # reporting a slow provider
+        stage_timeout(None, "script")
         raise TimeoutError(f"LLM call timed out after {timeout} seconds")
+    except Exception:
+        if cached_content:
+            # The cache may have been evicted early; don't hand it out again
+            source_context_cache.invalidate(cached_content)
+        raise
     
-    if exception:
-        raise exception
+    _log_llm_usage(dialogue_format, model, time.time() - start_time, usage)
     
     if result is None:
         raise Exception("LLM call failed without returning a result")
@@ -174,236 +528,155 @@ def call_llm(system_prompt: str, text: str, dialogue_format: Any, timeout: int =
     return result
 
 
+def _log_llm_usage(dialogue_format: Any, model: str, latency: float, usage: Any) -> None:
+    """Log latency and token counts of a finished LLM call."""
+    if usage is None:
+        logger.info(f"LLM call ({dialogue_format.__name__}, {model}): {latency:.1f}s, token usage unavailable")
+        return
+    logger.info(
+        f"LLM call ({dialogue_format.__name__}, {model}): {latency:.1f}s, "
+        f"input tokens={usage.input_tokens}, "
+        f"cached input tokens={usage.cached_input_tokens}, "
+        f"output tokens={usage.output_tokens}, "
+        f"thinking tokens={usage.thinking_tokens}"
+    )
+
+
 def parse_url(url: str) -> str:
     """Parse the given URL and return the text content."""
-    for attempt in range(JINA_RETRY_ATTEMPTS):
-        try:
-            full_url = f"{JINA_READER_URL}{url}"
-            response = requests.get(full_url, timeout=60)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            break
-        except requests.RequestException as e:
-            if attempt == JINA_RETRY_ATTEMPTS - 1:  # Last attempt
-                raise ValueError(
-                    f"Failed to fetch URL after {JINA_RETRY_ATTEMPTS} attempts: {e}"
-                ) from e
-            time.sleep(JINA_RETRY_DELAY)  # Wait for X second before retrying
+    return engine.run(aparse_url(url))
+
+
+async def aparse_url(url: str) -> str:
+    """Fetch the given URL through Jina Reader and return the text content."""
+    async def fetch():
+        response = await engine.http_client().get(f"{JINA_READER_URL}{url}", timeout=stage_timeout(60, "ingest"))
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return response
+
+    try:
+        response = await _jina_retry_policy.call(fetch, "Jina Reader request")
+    except httpx.HTTPError as e:
+        raise ValueError(f"Failed to fetch URL: {e}") from e
     return response.text
 
 
-def clear_voice_cache():
-    """Clear the voice cache to ensure fresh voice assignments for new podcasts."""
-    if hasattr(_use_google_tts, '_voice_cache'):
-        _use_google_tts._voice_cache.clear()
-    if hasattr(_use_elevenlabs_tts, '_voice_cache'):
-        _use_elevenlabs_tts._voice_cache.clear()
+def generate_podcast_audio(text: str, speaker: str, voice_plan: VoicePlan) -> str:
+    """Generate audio for podcast using the voice provider of the job's voice plan."""
+    return engine.run(agenerate_podcast_audio(text, speaker, voice_plan))
 
 
-def generate_podcast_audio(
-    text: str, speaker: str, language: str, voice_assignments: dict = None, voice_provider: str = "google_tts"
-) -> str:
-    """Generate audio for podcast using the specified voice provider."""
-    
-    # Convert voice_provider format from forms (google_tts -> google, elevenlabs -> elevenlabs)
-    if voice_provider == "google_tts":
-        provider = "google"
-    elif voice_provider == "elevenlabs":
-        provider = "elevenlabs"
-    else:
-        provider = "google"  # default fallback
-    
-    if provider == "elevenlabs":
-        return _use_elevenlabs_tts(text, speaker, language, voice_assignments)
-    else:  # default to google
-        if not google_tts_client:
-            raise ValueError("Google Cloud TTS client not initialized. Please set GOOGLE_CLOUD_API_KEY environment variable.")
-        return _use_google_tts(text, speaker, language, voice_assignments)
-
-
-def _use_google_tts(text: str, speaker: str, language: str, voice_assignments: dict = None) -> str:
-    """Generate audio using Google Cloud Text-to-Speech with Chirp HD voices."""
-    if not google_tts_client:
-        raise ValueError("Google Cloud TTS client not initialized. Please set GOOGLE_CLOUD_API_KEY environment variable.")
-    
-    # Use provided voice assignments or fallback to the default
-    voices_to_use = voice_assignments if voice_assignments else GOOGLE_TTS_VOICES
-    
-    # Get the appropriate voice for the speaker and language
-    # voices_to_use[speaker] now contains a dict with language->list mappings
-    speaker_voices = voices_to_use.get(speaker, {})
-    
-    # Get list of voices for this language
-    voice_list = speaker_voices.get(language, [])
-    if not voice_list:
-        # Fallback to English if language not supported
-        voice_list = speaker_voices.get("English", ["en-US-Chirp-HD-F"])
-    
-    # Check if we have a selected voice for this speaker/language combination stored
-    # This ensures consistent voice selection throughout the podcast
-    cache_key = f"{speaker}_{language}"
-    if not hasattr(_use_google_tts, '_voice_cache'):
-        _use_google_tts._voice_cache = {}
-    
-    if cache_key in _use_google_tts._voice_cache:
-        voice_name = _use_google_tts._voice_cache[cache_key]
-    else:
-        # Select a voice that's not already used by other speakers
-        import random
-        used_voices = set(_use_google_tts._voice_cache.values())
-        available_voices = [v for v in voice_list if v not in used_voices]
-        
-        # If all voices are used, fall back to any voice (shouldn't happen with 4 voices per gender)
-        if not available_voices:
-            available_voices = voice_list
-            
-        voice_name = random.choice(available_voices)
-        _use_google_tts._voice_cache[cache_key] = voice_name
-    
-    # Extract language code from voice name (e.g., "en-US" from "en-US-Chirp-HD-F")
-    language_code = '-'.join(voice_name.split('-')[:2])
+async def agenerate_podcast_audio(text: str, speaker: str, voice_plan: VoicePlan, failover: bool = False) -> str:
+    """Generate audio for one line in the speaker's planned voice and return the file path.
+
+    With failover=True (the last attempt of a line), any failure of the planned
+    provider falls back to the other provider, not only an outage.
+    """
+    voice_id = voice_plan.voice_for(speaker)
+    provider = get_tts_provider(voice_plan.provider)
     
-    for attempt in range(GOOGLE_TTS_RETRY_ATTEMPTS):
-        try:
-            # Set up the synthesis input (plain text only for Chirp HD voices)
-            synthesis_input = texttospeech.SynthesisInput(text=text)
-            
-            # Configure the voice
-            voice = texttospeech.VoiceSelectionParams(
-                language_code=language_code,
-                name=voice_name
-            )
-            
-            # Configure the audio output (Chirp HD voices don't support A-Law encoding)
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3
-            )
-            
-            # Generate the speech
-            response = google_tts_client.synthesize_speech(
-                input=synthesis_input, 
-                voice=voice, 
-                audio_config=audio_config
-            )
-            
-            # Save the audio to a file
-            import tempfile
-            import os
-            import uuid
-            
-            # Ensure our custom temp directory exists and is writable
-            os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
-            
-            # Create a unique filename to avoid conflicts
-            unique_filename = f"tts_audio_{uuid.uuid4().hex}.mp3"
-            temp_file_path = os.path.join(TEMP_AUDIO_DIR, unique_filename)
-            
-            # Write the audio content directly to the file
-            try:
-                with open(temp_file_path, 'wb') as audio_file:
-                    audio_file.write(response.audio_content)
-            except (PermissionError, OSError) as e:
-                raise Exception(f"Permission denied: Unable to create temporary audio file. Please ensure the application has write permissions to the temporary directory: {e}")
-            
-            return temp_file_path
-            
-        except Exception as e:
-            if attempt == GOOGLE_TTS_RETRY_ATTEMPTS - 1:  # Last attempt
-                raise Exception(f"Google Cloud TTS failed after {GOOGLE_TTS_RETRY_ATTEMPTS} attempts: {e}")
-            time.sleep(GOOGLE_TTS_RETRY_DELAY)
+    try:
+        provider.check_configured()
+        return await _synthesize_tts(provider, text, voice_id)
+    except Exception:
+        # Only a provider outage (open circuit) or a last attempt justifies switching providers
+        if not TTS_FAILOVER_ENABLED or not (failover or get_circuit_breaker(provider.name).is_open):
+            raise
+        audio_file_path = await _failover_tts(text, speaker, voice_plan)
+        if audio_file_path is None:
+            raise
+        return audio_file_path
 
 
-def _use_elevenlabs_tts(text: str, speaker: str, language: str, voice_assignments: dict = None) -> str:
-    """Generate audio using ElevenLabs Text-to-Speech."""
-    from constants import ELEVENLABS_API_KEY, ELEVENLABS_RETRY_ATTEMPTS, ELEVENLABS_RETRY_DELAY
-    
-    if not ELEVENLABS_API_KEY:
-        raise ValueError("ElevenLabs API key not initialized. Please set ELEVENLABS_API_KEY environment variable.")
-    
-    # Use provided voice assignments or fallback to the default
-    voices_to_use = voice_assignments if voice_assignments else {}
-    
-    # Get the appropriate voice for the speaker and language
-    speaker_voices = voices_to_use.get(speaker, {})
-    
-    # Get list of voices for this language
-    voice_list = speaker_voices.get(language, [])
-    if not voice_list:
-        # Fallback to English if language not supported
-        voice_list = speaker_voices.get("English", [])
-    
-    if not voice_list:
-        raise ValueError(f"No ElevenLabs voices available for speaker {speaker} and language {language}")
-    
-    # Check if we have a selected voice for this speaker/language combination stored
-    # This ensures consistent voice selection throughout the podcast
-    cache_key = f"{speaker}_{language}"
-    if not hasattr(_use_elevenlabs_tts, '_voice_cache'):
-        _use_elevenlabs_tts._voice_cache = {}
-    
-    if cache_key in _use_elevenlabs_tts._voice_cache:
-        voice_id = _use_elevenlabs_tts._voice_cache[cache_key]
+def get_tts_provider(name: str) -> TTSProvider:
+    """Return the TTS provider for a voice_provider value, defaulting to Google Cloud TTS."""
+    return tts_providers.get(name) or tts_providers["google_tts"]
+
+
+async def _failover_tts(text: str, speaker: str, voice_plan: VoicePlan) -> Optional[str]:
+    """Synthesize a line with the other TTS provider, in a voice of the same gender.
+
+    Returns None if the other provider is not configured or has no matching voice.
+    """
+    from voice_manager import map_voice
+    
+    source = voice_plan.provider
+    
+    # Failover is between the two hosted providers
+    targets = {"google_tts": "elevenlabs", "elevenlabs": "google_tts"}
+    if source not in targets:
+        return None
+    target = get_tts_provider(targets[source])
+    if not target.is_configured() or get_circuit_breaker(target.name).is_open:
+        return None
+    
+    # Stand in for the voice this speaker has on the failed provider; the
+    # guest gets a different voice from the host's unless there is no other
+    host_voice_id = map_voice(source, target.name, voice_plan.language, voice_plan.host_voice)
+    if voice_plan.role(speaker) == HOST:
+        target_voice_id = host_voice_id
     else:
-        # Select a voice that's not already used by other speakers
-        import random
-        used_voices = set(_use_elevenlabs_tts._voice_cache.values())
-        available_voices = [v for v in voice_list if v not in used_voices]
-        
-        # If all voices are used, fall back to any voice
-        if not available_voices:
-            available_voices = voice_list
-            
-        voice_id = random.choice(available_voices)
-        _use_elevenlabs_tts._voice_cache[cache_key] = voice_id
-    
-    # ElevenLabs API endpoint
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-    
-    headers = {
-        "Accept": "audio/mpeg",
-        "Content-Type": "application/json",
-        "xi-api-key": ELEVENLABS_API_KEY
-    }
-    
-    data = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.5,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
+        target_voice_id = map_voice(
+            source, target.name, voice_plan.language, voice_plan.guest_voice, avoid_voice_id=host_voice_id
+        )
+    if target_voice_id is None:
+        return None
     
-    for attempt in range(ELEVENLABS_RETRY_ATTEMPTS):
+    logger.warning(f"{source} is unavailable, synthesizing line for {speaker} with {target.name} voice {target_voice_id}")
+    return await _synthesize_tts(target, text, target_voice_id)
+
+
+async def _synthesize_tts(provider: TTSProvider, text: str, voice_id: str) -> str:
+    """Synthesize text with a TTS provider and return the audio file path."""
+    import os
+    import uuid
+    
+    # Ensure our custom temp directory exists and is writable
+    os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
+    
+    async def synthesize():
+        # Every attempt (retried or hedged) writes its own file, so an abandoned
+        # attempt that is still streaming cannot corrupt the one that is used
+        unique_filename = f"{provider.file_prefix}_{uuid.uuid4().hex}.{provider.output_format}"
+        temp_file_path = os.path.join(TEMP_AUDIO_DIR, unique_filename)
         try:
-            response = requests.post(url, json=data, headers=headers, timeout=60)
-            response.raise_for_status()
-            
-            # Save the audio to a file
-            import os
-            import uuid
-            
-            # Ensure our custom temp directory exists and is writable
-            os.makedirs(TEMP_AUDIO_DIR, exist_ok=True)
-            
-            # Create a unique filename to avoid conflicts
-            unique_filename = f"elevenlabs_audio_{uuid.uuid4().hex}.mp3"
-            temp_file_path = os.path.join(TEMP_AUDIO_DIR, unique_filename)
-            
-            # Write the audio content directly to the file
-            try:
-                with open(temp_file_path, 'wb') as audio_file:
-                    audio_file.write(response.content)
-            except (PermissionError, OSError) as e:
-                raise Exception(f"Permission denied: Unable to create temporary audio file. Please ensure the application has write permissions to the temporary directory: {e}")
-            
-            return temp_file_path
-            
-        except Exception as e:
-            if attempt == ELEVENLABS_RETRY_ATTEMPTS - 1:  # Last attempt
-                raise Exception(f"ElevenLabs TTS failed after {ELEVENLABS_RETRY_ATTEMPTS} attempts: {e}")
-            time.sleep(ELEVENLABS_RETRY_DELAY)
+            # Use a key from the provider's pool and stay within that key's rate limit
+            with provider.key_pool.lease() if provider.key_pool is not None else nullcontext() as api_key:
+                async with get_rate_limiter(provider.name, api_key).slot(len(text)):
+                    # The provider's own timeout, or less if the job is running out of time
+                    try:
+                        await asyncio.wait_for(
+                            provider.synthesize_to_file(text, voice_id, api_key, temp_file_path),
+                            stage_timeout(None, "synthesis")
+                        )
+                    except asyncio.TimeoutError:
+                        # When the job's time ran out, this raises DeadlineExceeded instead:
+                        # it is neither retried nor counted as a provider failure
+                        stage_timeout(None, "synthesis")
+                        raise
+        except BaseException:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+            raise
+        return temp_file_path
+    
+    async def synthesize_hedged():
+        # Resend the request if it is slower than usual and keep the first response
+        capacity = provider.key_pool if provider.key_pool is not None else get_rate_limiter(provider.name, None)
+        return await get_hedger(provider.name).run(synthesize, capacity)
+    
+    async def synthesize_guarded():
+        # Fail immediately while the provider is known to be down
+        return await get_circuit_breaker(provider.name).call(
+            synthesize_hedged if TTS_HEDGING_ENABLED else synthesize
+        )
+    
+    try:
+        return await provider.retry_policy.call(synthesize_guarded, f"{provider.display_name} request")
+    except PermissionError as e:
+        raise Exception(f"Permission denied: Unable to create temporary audio file. Please ensure the application has write permissions to the temporary directory: {e}") from e
+    except Exception as e:
+        raise Exception(f"{provider.display_name} failed: {e}") from e
 
 
 def generate_vtt_content(dialogue_items, audio_segments):
@@ -457,8 +730,8 @@ def cleanup_temp_audio_files(max_age_hours=24):
         current_time = time.time()
         max_age_seconds = max_age_hours * 3600
         
-        # Clean up TTS audio files (both Google and ElevenLabs)
-        for pattern in ["tts_audio_*.mp3", "elevenlabs_audio_*.mp3"]:
+        # Clean up TTS audio files (Google, ElevenLabs and the local provider)
+        for pattern in ["tts_audio_*.mp3", "elevenlabs_audio_*.mp3", "local_audio_*.wav"]:
             for file_path in glob.glob(os.path.join(TEMP_AUDIO_DIR, pattern)):
                 try:
                     if os.path.isfile(file_path):
@@ -469,6 +742,10 @@ def cleanup_temp_audio_files(max_age_hours=24):
                     # If we can't remove the file, just continue
                     continue
                 
+        # Checkpoints of failed jobs that were not retried in time
+        from job_checkpoint import cleanup_checkpoints
+        cleanup_checkpoints()
+                
         # Clean up gradio cache directory as well
         from constants import GRADIO_CACHE_DIR, GRADIO_CLEAR_CACHE_OLDER_THAN
         
@@ -100,6 +100,54 @@ class VoiceManager:
                 return voice
         return None
     
+    def map_voice(
+        self,
+        source_provider: str,
+        target_provider: str,
+        language: str,
+        voice_id: str,
+        avoid_voice_id: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Find a voice on another provider that stands in for the given voice.
+        
+        The replacement has the same gender. Voices are matched by their position
+        within that gender, so different source voices map to different targets
+        and the same source voice always maps to the same target.
+        
+        Args:
+            source_provider: Provider of voice_id ("google_tts" or "elevenlabs")
+            target_provider: Provider to find a replacement on
+            language: Language name
+            voice_id: Voice ID on the source provider
+            avoid_voice_id: Target voice the other speaker already has; the next
+                candidate is used instead unless it is the only one
+            
+        Returns:
+            Voice ID on the target provider or None if it has no voices for the language
+        """
+        source_voice = self.get_voice_by_id(source_provider, language, voice_id)
+        gender = source_voice.get('gender', '') if source_voice else ''
+        
+        candidates = self.get_voices_by_gender(target_provider, language, gender) if gender else []
+        if not candidates:
+            # Unknown gender: any voice is better than no audio
+            candidates = self.load_voices(target_provider, language)
+        if not candidates:
+            return None
+        
+        if gender:
+            source_ids = [v.get('id') for v in self.get_voices_by_gender(source_provider, language, gender)]
+            index = source_ids.index(voice_id)
+        else:
+            index = 0
+        # Walk on from the matched position past the other speaker's voice
+        for offset in range(len(candidates)):
+            candidate_id = candidates[(index + offset) % len(candidates)].get('id')
+            if candidate_id != avoid_voice_id:
+                return candidate_id
+        return candidates[index % len(candidates)].get('id')
+    
     def get_available_languages(self, provider: str) -> List[str]:
         """
         Get list of available languages for a provider.
@@ -197,4 +245,8 @@ def get_voice_assignments(provider: str, language: str, host_gender: str = "rand
 
 def get_voice_options_for_language(provider: str, language: str) -> Dict[str, List[Dict]]:
     """Get all voice options for a language, organized by gender"""
-    return voice_manager.get_voice_options_for_language(provider, language) 
\ No newline at end of file
+    return voice_manager.get_voice_options_for_language(provider, language) 
+
+def map_voice(source_provider: str, target_provider: str, language: str, voice_id: str, avoid_voice_id: Optional[str] = None) -> Optional[str]:
+    """Find a voice of the same gender on another provider, other than avoid_voice_id if possible"""
+    return voice_manager.map_voice(source_provider, target_provider, language, voice_id, avoid_voice_id)
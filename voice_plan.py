@@ -0,0 +1,98 @@
+"""
+voice_plan.py - The voices of one podcast job, chosen once before synthesis
+
+A VoicePlan maps the two roles of a podcast (host and guest) to concrete voice
+IDs of one TTS provider. It is resolved once when a job starts and passed to
+every synthesis call, so concurrent lines and concurrent jobs never share
+mutable voice state:
+
+    plan = resolve_voice_plan(voice_assignments, "English", "google_tts", host_name="Sam")
+    plan.voice_for("Host (Sam)")   # the same voice for every host line
+"""
+
+import random
+from dataclasses import dataclass
+from typing import List, Optional
+
+from loguru import logger
+
+from dialogue_repair import normalize_name
+
+# Used when no Google voice is configured for the speaker at all
+DEFAULT_GOOGLE_VOICE = "en-US-Chirp-HD-F"
+
+HOST = "host"
+GUEST = "guest"
+
+
+@dataclass(frozen=True)
+class VoicePlan:
+    """Voice IDs of the host and the guest of one job on one provider."""
+
+    provider: str  # "google_tts" or "elevenlabs"
+    language: str
+    host_voice: str
+    guest_voice: str
+    host_name: str = "Sam"
+
+    def role(self, speaker: str) -> str:
+        """Return HOST or GUEST for a speaker label of the script.
+
+        The LLM labels the host "Host (<name>)" and edited scripts use
+        "Host (Sam)" or the host's name; every other speaker is the guest.
+        """
+        # Whole words only: "Ghost" or "Thomas Hostetler" are guests
+        label = normalize_name(speaker)
+        if 'host' in label.split() or label == normalize_name(self.host_name):
+            return HOST
+        return GUEST
+
+    def voice_for(self, speaker: str) -> str:
+        """Return the voice ID for a speaker label."""
+        return self.host_voice if self.role(speaker) == HOST else self.guest_voice
+
+
+def _voice_list(voice_assignments: dict, role_key: str, language: str) -> List[str]:
+    """Return the candidate voices of one role, falling back to English."""
+    role_voices = voice_assignments.get(role_key) or {}
+    return role_voices.get(language) or role_voices.get("English") or []
+
+
+def _pick_voice(candidates: List[str], taken: Optional[str]) -> Optional[str]:
+    """Pick a random candidate, avoiding the voice the other role already has."""
+    available = [voice for voice in candidates if voice != taken] or candidates
+    return random.choice(available) if available else None
+
+
+def resolve_voice_plan(voice_assignments: dict, language: str, provider: str, host_name: Optional[str] = "Sam") -> VoicePlan:
+    """
+    Choose one voice per role from the candidate voices of each role.
+
+    Args:
+        voice_assignments: {"Host (Sam)": {language: [voice IDs]}, "Guest": {...}}
+        language: Language name
+        provider: "google_tts" or "elevenlabs"
+        host_name: Name the host goes by in the script
+
+    Returns:
+        The voice plan of the job
+    """
+    host_voice = _pick_voice(_voice_list(voice_assignments, "Host (Sam)", language), None)
+    guest_voice = _pick_voice(_voice_list(voice_assignments, "Guest", language), host_voice)
+
+    if provider == "elevenlabs":
+        if not host_voice or not guest_voice:
+            raise ValueError(f"No ElevenLabs voices available for language {language}")
+    else:
+        host_voice = host_voice or DEFAULT_GOOGLE_VOICE
+        guest_voice = guest_voice or DEFAULT_GOOGLE_VOICE
+
+    plan = VoicePlan(
+        provider=provider,
+        language=language,
+        host_voice=host_voice,
+        guest_voice=guest_voice,
+        host_name=host_name or "Sam",
+    )
+    logger.info(f"Voice plan ({provider}, {language}): host={plan.host_voice}, guest={plan.guest_voice}")
+    return plan